@@ -1,16 +1,94 @@
 """FastAPI application for Asset Companion."""
+import asyncio
+import functools
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
 from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from asset_companion.pipeline import process_one, SuperRes
+from PIL import UnidentifiedImageError
+from asset_companion.pipeline import process_one_async, process_batch, SuperRes
 from asset_companion.detect import Kind
+from asset_companion.io import probe_size
+from asset_companion.realesrgan import warmup
+from asset_companion.size_utils import auto_suggest_size, calculate_target_size
+
+# CPU-bound pipeline work runs in worker processes so the event loop stays
+# responsive and concurrent uploads use several cores. Requests with
+# super-resolution go to a single SR worker instead, which loads the
+# in-process SR model (if installed) as it starts: one model session, and
+# on CUDA one copy of it in GPU memory, however many CPU workers there are.
+# Workers are spawned, not forked: a forked child would inherit this
+# process's thread pools without their threads.
+WORKERS = max(1, (os.cpu_count() or 2) // 2)
+SR_WORKERS = 1
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _new_executor(pool: str) -> ProcessPoolExecutor:
+    if pool == "sr":
+        return ProcessPoolExecutor(max_workers=SR_WORKERS, mp_context=MP_CONTEXT, initializer=warmup)
+    return ProcessPoolExecutor(max_workers=WORKERS, mp_context=MP_CONTEXT)
+
+
+EXECUTORS: Dict[str, ProcessPoolExecutor] = {pool: _new_executor(pool) for pool in ("cpu", "sr")}
+
+T = TypeVar("T")
+
+
+def _replace_executor(pool: str, broken: Executor) -> None:
+    """Swap in a fresh worker pool if `broken` is still the current one."""
+    if EXECUTORS[pool] is broken:
+        EXECUTORS[pool] = _new_executor(pool)
+        # A broken pool has already failed every pending future
+        broken.shutdown(wait=False)
+
+
+async def _run_on_workers(superres: str, call: Callable[[Executor], Awaitable[T]]) -> T:
+    """
+    Await call(executor) on the pool for `superres`, replacing it if a worker died.
+    
+    A worker that exits abruptly (e.g. killed when out of memory) breaks
+    the whole ProcessPoolExecutor, and every later submit would fail. The
+    request that hit it still fails; later requests get a new pool.
+    """
+    pool = "sr" if superres == "realesrgan" else "cpu"
+    executor = EXECUTORS[pool]
+    try:
+        return await call(executor)
+    except BrokenProcessPool:
+        _replace_executor(pool, executor)
+        raise
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the workers (and so the SR model warmup) before the first request
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(loop.run_in_executor(EXECUTORS["cpu"], os.getpid) for _ in range(WORKERS)),
+        *(loop.run_in_executor(EXECUTORS["sr"], os.getpid) for _ in range(SR_WORKERS))
+    )
+    yield
+    # Requests still running at shutdown are cancelled by the server, and
+    # cancelling the awaiting task cancels its pending pool future too
+    for executor in EXECUTORS.values():
+        executor.shutdown(wait=False)
+
 
 app = FastAPI(
     title="Asset Companion",
     description="Simple utility tool for asset processing.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -29,6 +107,143 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 INPUT_DIR = Path("inputs")
 INPUT_DIR.mkdir(exist_ok=True)
 
+# Plain-string prefixes for the per-request hot path (no Path objects)
+INPUT_DIR_STR = str(INPUT_DIR) + os.sep
+OUTPUT_DIR_STR = str(OUTPUT_DIR) + os.sep
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_BATCH_FILES = 64
+
+
+def _validate_options(target: int, size_mode: str, kind: str, superres: str) -> None:
+    """
+    Validate the processing form fields shared by /process and /process_batch.
+    
+    Raises:
+        HTTPException: 400 on any invalid value
+    """
+    if target < 1 or target > 4096:
+        raise HTTPException(
+            status_code=400,
+            detail="Target size must be between 1 and 4096"
+        )
+    
+    if kind not in ("auto", "pixel_art", "illustration"):
+        raise HTTPException(
+            status_code=400,
+            detail="Kind must be 'auto', 'pixel_art', or 'illustration'"
+        )
+    
+    if superres not in ("none", "realesrgan"):
+        raise HTTPException(
+            status_code=400,
+            detail="Superres must be 'none' or 'realesrgan'"
+        )
+    
+    if size_mode not in ("square", "auto", "power_of_two", "multiple", "custom"):
+        raise HTTPException(
+            status_code=400,
+            detail="size_mode must be 'square', 'auto', 'power_of_two', 'multiple', or 'custom'"
+        )
+
+
+def _save_upload(file: UploadFile) -> str:
+    """
+    Stream an upload to INPUT_DIR under a unique name.
+    
+    The client's filename is kept (without any directory part) behind a
+    random prefix, so uploads that share a name, in one batch or in
+    concurrent requests, never overwrite each other's input or output.
+    Blocking file I/O: the endpoints call it via run_in_threadpool.
+    
+    Args:
+        file: Uploaded image file
+        
+    Returns:
+        Path of the saved file
+        
+    Raises:
+        HTTPException: 400 if the filename is missing or the file is empty
+    """
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Filename is required")
+    src_path = INPUT_DIR_STR + uuid.uuid4().hex[:12] + "_" + os.path.basename(file.filename)
+    # Stream to disk in 1 MB chunks instead of reading the whole upload into memory
+    with open(src_path, "wb") as f:
+        shutil.copyfileobj(file.file, f, length=UPLOAD_CHUNK_SIZE)
+        size = f.tell()
+    if size == 0:
+        os.unlink(src_path)
+        raise HTTPException(status_code=400, detail="Empty file")
+    return src_path
+
+
+def _output_path(src_path: str) -> str:
+    """Output path for a saved upload: OUTPUT_DIR/<stem>_ac.png."""
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+    return OUTPUT_DIR_STR + stem + "_ac.png"
+
+
+def _resolve_target_size(
+    file: UploadFile,
+    size_mode: str,
+    size_width: Optional[int],
+    size_height: Optional[int],
+    size_multiple: str,
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Calculate target dimensions based on size mode.
+    
+    Only the modes derived from the input size read its dimensions, and
+    then only from the header of the (already saved) upload spool.
+    
+    Returns:
+        (target_w, target_h) tuple, both None for square output
+        
+    Raises:
+        HTTPException: 400 on invalid custom size or an unreadable image
+    """
+    if size_mode == "square":
+        return None, None
+    
+    if size_mode == "custom":
+        if size_width is None or size_height is None:
+            raise HTTPException(
+                status_code=400,
+                detail="size_width and size_height required for custom mode"
+            )
+        if size_width < 1 or size_width > 4096 or size_height < 1 or size_height > 4096:
+            raise HTTPException(
+                status_code=400,
+                detail="Custom size must be between 1 and 4096"
+            )
+        return size_width, size_height
+    
+    file.file.seek(0)
+    try:
+        input_w, input_h = probe_size(file.file)
+    except UnidentifiedImageError:
+        # PIL's own message names the spool object, not the upload
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot read image {file.filename}: unrecognized format"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Cannot read image {file.filename}: {e}")
+    if size_mode == "auto":
+        return auto_suggest_size(input_w, input_h)
+    
+    # Calculate using size_utils
+    multiple_val = int(size_multiple) if size_multiple.isdigit() else 8
+    if multiple_val not in (2, 4, 8, 16):
+        multiple_val = 8
+    
+    return calculate_target_size(
+        input_w, input_h,
+        mode=size_mode,
+        multiple=multiple_val
+    )
+
 
 @app.post("/process")
 async def process(
@@ -63,88 +278,26 @@ async def process(
         JSON response with processing metadata
     """
     try:
-        # Validate inputs
-        if target < 1 or target > 4096:
-            raise HTTPException(
-                status_code=400,
-                detail="Target size must be between 1 and 4096"
-            )
-        
-        if kind not in ("auto", "pixel_art", "illustration"):
-            raise HTTPException(
-                status_code=400,
-                detail="Kind must be 'auto', 'pixel_art', or 'illustration'"
-            )
-        
-        if superres not in ("none", "realesrgan"):
-            raise HTTPException(
-                status_code=400,
-                detail="Superres must be 'none' or 'realesrgan'"
-            )
-        
-        if size_mode not in ("square", "auto", "power_of_two", "multiple", "custom"):
-            raise HTTPException(
-                status_code=400,
-                detail="size_mode must be 'square', 'auto', 'power_of_two', 'multiple', or 'custom'"
-            )
+        _validate_options(target, size_mode, kind, superres)
         
         # Save uploaded file first to get dimensions
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="Filename is required")
-        src_path = INPUT_DIR / file.filename
-        with src_path.open("wb") as f:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="Empty file")
-            f.write(content)
-        
-        # Load image to get dimensions for size calculation
-        from PIL import Image
-        from asset_companion.size_utils import calculate_target_size
-        
-        with Image.open(src_path) as img:
-            input_w, input_h = img.size
-        
-        # Calculate target dimensions based on mode
-        if size_mode == "square":
-            target_w = None
-            target_h = None
-        elif size_mode == "custom":
-            if size_width is None or size_height is None:
-                raise HTTPException(
-                    status_code=400,
-                    detail="size_width and size_height required for custom mode"
-                )
-            if size_width < 1 or size_width > 4096 or size_height < 1 or size_height > 4096:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Custom size must be between 1 and 4096"
-                )
-            target_w = size_width
-            target_h = size_height
-        else:
-            # Calculate using size_utils
-            multiple_val = int(size_multiple) if size_multiple.isdigit() else 8
-            if multiple_val not in (2, 4, 8, 16):
-                multiple_val = 8
-            
-            target_w, target_h = calculate_target_size(
-                input_w, input_h,
-                mode=size_mode,
-                multiple=multiple_val
-            )
+        src_path = await run_in_threadpool(_save_upload, file)
+        target_w, target_h = _resolve_target_size(
+            file, size_mode, size_width, size_height, size_multiple
+        )
         
-        # Process
-        output_path = OUTPUT_DIR / (src_path.stem + "_ac.png")
-        meta = process_one(
+        # Process (in a worker process; the pipeline reopens src_path there)
+        output_path = _output_path(src_path)
+        meta = await _run_on_workers(superres, lambda executor: process_one_async(
             src=src_path,
             dst=output_path,
             target=target,
             target_w=target_w,
             target_h=target_h,
             kind=Kind(kind),
-            superres=superres
-        )
+            superres=superres,
+            executor=executor
+        ))
         
         return JSONResponse({"ok": True, "meta": meta})
         
@@ -157,6 +310,97 @@ async def process(
         )
 
 
+@app.post("/process_batch")
+async def process_batch_endpoint(
+    files: List[UploadFile] = File(...),
+    target: int = Form(512),
+    size_mode: str = Form("square"),
+    size_width: Optional[int] = Form(None),
+    size_height: Optional[int] = Form(None),
+    size_multiple: str = Form("8"),
+    kind: str = Form("auto"),
+    superres: str = Form("none"),
+) -> JSONResponse:
+    """
+    Process several uploaded images in one request.
+    
+    Takes the same options as /process, applied to every file. Per-file
+    failures are reported in the results instead of failing the request.
+    
+    Args:
+        files: Uploaded image files (at most MAX_BATCH_FILES)
+        target: Target square size in pixels (used if size_mode="square")
+        size_mode: Size calculation mode (see /process)
+        size_width: Custom width (used if size_mode="custom")
+        size_height: Custom height (used if size_mode="custom")
+        size_multiple: Multiple for "multiple" mode
+        kind: Image kind - "auto", "pixel_art", or "illustration"
+        superres: Super-resolution method - "none" or "realesrgan"
+        
+    Returns:
+        JSON response with a list of per-file metadata
+    """
+    try:
+        _validate_options(target, size_mode, kind, superres)
+        if len(files) > MAX_BATCH_FILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_BATCH_FILES} files per batch"
+            )
+        
+        # Files that can't be saved or sized fail on their own; the rest
+        # are processed together
+        results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        indices, srcs, dsts, sizes = [], [], [], []
+        for i, file in enumerate(files):
+            try:
+                src_path = await run_in_threadpool(_save_upload, file)
+            except HTTPException as e:
+                results[i] = {"src": file.filename, "error": e.detail, "ok": False}
+                continue
+            try:
+                target_w, target_h = _resolve_target_size(
+                    file, size_mode, size_width, size_height, size_multiple
+                )
+            except HTTPException as e:
+                if size_mode == "custom":
+                    # Invalid custom size: the same for every file
+                    raise
+                results[i] = {"src": src_path, "error": e.detail, "ok": False}
+                continue
+            indices.append(i)
+            srcs.append(src_path)
+            dsts.append(_output_path(src_path))
+            sizes.append((target_w, target_h) if target_w is not None else None)
+        
+        if srcs:
+            job = functools.partial(
+                process_batch,
+                srcs,
+                dsts,
+                target=target,
+                target_sizes=sizes,
+                kind=Kind(kind),
+                superres=superres
+            )
+            processed = await _run_on_workers(
+                superres,
+                lambda executor: asyncio.get_running_loop().run_in_executor(executor, job)
+            )
+            for i, meta in zip(indices, processed):
+                results[i] = meta
+        
+        return JSONResponse({"ok": all(r["ok"] for r in results), "results": results})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(
+            {"ok": False, "error": str(e)},
+            status_code=500
+        )
+
+
 @app.get("/download", response_model=None)
 async def download(path: str) -> Response:
     """
@@ -1,7 +1,105 @@
 """Alpha channel processing and edge cleanup."""
+from functools import lru_cache
 import numpy as np
 import cv2
+from numba import njit
 from PIL import Image
+from asset_companion.io import ImageBuf
+
+
+# Fixed-point reciprocal of alpha (8.8): value * _INV_ALPHA[a] >> 8 == value * 255 / a
+_INV_ALPHA = np.zeros(256, dtype=np.uint32)
+_INV_ALPHA[1:] = np.round(255.0 * 256.0 / np.arange(1, 256)).astype(np.uint32)
+
+
+@njit(cache=True, nogil=True)
+def _unpremult_u8(arr: np.ndarray) -> None:
+    """Unpremultiply an (H, W, 4) uint8 RGBA array in place."""
+    h, w = arr.shape[0], arr.shape[1]
+    for y in range(h):
+        for x in range(w):
+            a = arr[y, x, 3]
+            if a == 0:
+                continue
+            inv = int(_INV_ALPHA[a])
+            for c in range(3):
+                v = (int(arr[y, x, c]) * inv + 128) >> 8
+                arr[y, x, c] = min(v, 255)
+
+
+@njit(cache=True, nogil=True)
+def _unpremult_dilate_u8(src: np.ndarray, radius: int, out: np.ndarray) -> None:
+    """
+    out = src unpremultiplied, with alpha max-filtered over a square window.
+
+    RGB is unpremultiplied by the pixel's own (original) alpha, as
+    _unpremult_u8 does; alpha is the maximum of the in-bounds
+    (2 * radius + 1)^2 neighbourhood, as cv2.dilate with a square kernel.
+    """
+    h, w = src.shape[0], src.shape[1]
+    for y in range(h):
+        y0 = max(0, y - radius)
+        y1 = min(h, y + radius + 1)
+        for x in range(w):
+            a = src[y, x, 3]
+            if a == 0:
+                for c in range(3):
+                    out[y, x, c] = src[y, x, c]
+            else:
+                inv = int(_INV_ALPHA[a])
+                for c in range(3):
+                    v = (int(src[y, x, c]) * inv + 128) >> 8
+                    out[y, x, c] = min(v, 255)
+            m = a
+            for yy in range(y0, y1):
+                for xx in range(max(0, x - radius), min(w, x + radius + 1)):
+                    if src[yy, xx, 3] > m:
+                        m = src[yy, xx, 3]
+            out[y, x, 3] = m
+
+
+def _with_alpha(pil_img: Image.Image, alpha: np.ndarray) -> Image.Image:
+    """Return a copy of pil_img with only its alpha band replaced."""
+    out = pil_img.copy()
+    out.putalpha(Image.fromarray(alpha, mode="L"))
+    return out
+
+
+@lru_cache(maxsize=8)
+def _square_kernel(radius: int) -> np.ndarray:
+    """Square structuring element of side 2 * radius + 1 (cached, read-only)."""
+    kernel = np.ones((radius * 2 + 1, radius * 2 + 1), np.uint8)
+    kernel.flags.writeable = False
+    return kernel
+
+
+def _dilate_alpha(alpha: np.ndarray, radius: int) -> np.ndarray:
+    """Dilate an alpha plane with a square kernel."""
+    return cv2.dilate(alpha, _square_kernel(radius), iterations=1)
+
+
+def _blur_alpha(alpha: np.ndarray, radius: float) -> np.ndarray:
+    """Gaussian-blur an alpha plane."""
+    # Blur stays in uint8: fully opaque and fully transparent regions are
+    # preserved, only the transition band is smoothed
+    return cv2.GaussianBlur(alpha, (0, 0), radius)
+
+
+def unpremultiply_rgba_buf(buf: ImageBuf) -> ImageBuf:
+    """
+    Unpremultiply alpha channel in place (see unpremultiply_rgba).
+    
+    Args:
+        buf: Input ImageBuf (must be RGBA)
+        
+    Returns:
+        The same buffer, with unpremultiplied RGB
+    """
+    if buf.mode != "RGBA":
+        return buf
+    # Single uint8 pass; fully transparent pixels are left untouched
+    _unpremult_u8(buf.writable())
+    return buf
 
 
 def unpremultiply_rgba(pil_img: Image.Image) -> Image.Image:
@@ -16,14 +114,25 @@ def unpremultiply_rgba(pil_img: Image.Image) -> Image.Image:
     """
     if pil_img.mode != "RGBA":
         return pil_img
-    arr = np.array(pil_img).astype(np.float32)
-    rgb = arr[..., :3]
-    a = arr[..., 3:4] / 255.0
-    # Avoid division by zero
-    mask = a > 1e-5
-    rgb[mask[..., 0]] = rgb[mask[..., 0]] / np.clip(a[mask[..., 0]], 1e-5, 1.0)
-    arr[..., :3] = np.clip(rgb, 0, 255)
-    return Image.fromarray(arr.astype(np.uint8), mode="RGBA")
+    return unpremultiply_rgba_buf(ImageBuf.from_pil(pil_img)).to_pil()
+
+
+def defringe_alpha_buf(buf: ImageBuf, radius: int = 1) -> ImageBuf:
+    """
+    Dilate the alpha channel in place (see defringe_alpha).
+    
+    Args:
+        buf: Input ImageBuf (must be RGBA)
+        radius: Dilation radius
+        
+    Returns:
+        The same buffer, with dilated alpha
+    """
+    if buf.mode != "RGBA":
+        return buf
+    arr = buf.writable()
+    arr[..., 3] = _dilate_alpha(arr[..., 3], radius)
+    return buf
 
 
 def defringe_alpha(pil_img: Image.Image, radius: int = 1) -> Image.Image:
@@ -42,12 +151,52 @@ def defringe_alpha(pil_img: Image.Image, radius: int = 1) -> Image.Image:
     """
     if pil_img.mode != "RGBA":
         return pil_img
-    arr = np.array(pil_img)
-    a = arr[..., 3]
-    kernel = np.ones((radius * 2 + 1, radius * 2 + 1), np.uint8)
-    a_dil = cv2.dilate(a, kernel, iterations=1)
-    arr[..., 3] = a_dil
-    return Image.fromarray(arr, mode="RGBA")
+    # Only the alpha band changes; RGB is never pulled into NumPy
+    alpha = np.asarray(pil_img.getchannel("A"))
+    return _with_alpha(pil_img, _dilate_alpha(alpha, radius))
+
+
+def unpremultiply_defringe_buf(buf: ImageBuf, radius: int = 1) -> ImageBuf:
+    """
+    Unpremultiply and defringe a buffer in one pass.
+    
+    Same result as unpremultiply_rgba_buf followed by defringe_alpha_buf,
+    but every pixel is read and written once, into a fresh array (so a
+    read-only decoded view needs no separate copy first).
+    
+    Args:
+        buf: Input ImageBuf (must be RGBA)
+        radius: Dilation radius
+        
+    Returns:
+        The same buffer, holding the cleaned-up pixels
+    """
+    if buf.mode != "RGBA":
+        return buf
+    out = np.empty(buf.arr.shape, np.uint8)
+    _unpremult_dilate_u8(buf.arr, radius, out)
+    buf.arr = out
+    return buf
+
+
+def smooth_alpha_edges_buf(buf: ImageBuf, radius: float = 0.5) -> ImageBuf:
+    """
+    Blur the alpha channel in place (see smooth_alpha_edges).
+    
+    Args:
+        buf: Input ImageBuf (must be RGBA)
+        radius: Blur radius for alpha smoothing
+        
+    Returns:
+        The same buffer, with smoothed alpha
+    """
+    if buf.mode != "RGBA":
+        return buf
+    
+    arr = buf.writable()
+    # Apply light Gaussian blur to alpha channel only
+    arr[..., 3] = _blur_alpha(arr[..., 3], radius)
+    return buf
 
 
 def smooth_alpha_edges(pil_img: Image.Image, radius: float = 0.5) -> Image.Image:
@@ -66,16 +215,6 @@ def smooth_alpha_edges(pil_img: Image.Image, radius: float = 0.5) -> Image.Image
     """
     if pil_img.mode != "RGBA":
         return pil_img
-    
-    arr = np.array(pil_img).astype(np.float32)
-    alpha = arr[..., 3]
-    
-    # Apply light Gaussian blur to alpha channel only
-    alpha_blur = cv2.GaussianBlur(alpha, (0, 0), radius)
-    
-    # Preserve fully opaque and fully transparent regions
-    # Only smooth the transition band
-    alpha_smooth = np.clip(alpha_blur, 0, 255).astype(np.uint8)
-    
-    arr[..., 3] = alpha_smooth
-    return Image.fromarray(arr.astype(np.uint8), mode="RGBA")
+    # Only the alpha band changes; RGB is never pulled into NumPy
+    alpha = np.asarray(pil_img.getchannel("A"))
+    return _with_alpha(pil_img, _blur_alpha(alpha, radius))
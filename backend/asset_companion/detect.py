@@ -1,9 +1,34 @@
 """Image type detection and bounding box operations."""
 import enum
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
 import numpy as np
 import cv2
+from numba import njit
 from PIL import Image
+from asset_companion.io import ImageBuf
+
+
+# Saliency module is only present with opencv-contrib-python
+_HAS_SALIENCY = hasattr(cv2, "saliency")
+_SALIENCY = None
+
+# Side pool for detect_kind: the color count (numba, nogil) runs here while
+# Canny (OpenCV, releases the GIL) runs on the calling thread. A forked
+# child gets a pool of its own: the parent's threads do not survive the
+# fork, and work queued on the inherited pool would never run.
+_DETECT_POOL: ThreadPoolExecutor
+
+
+def _new_detect_pool() -> None:
+    global _DETECT_POOL
+    _DETECT_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="detect")
+
+
+_new_detect_pool()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_new_detect_pool)
 
 
 class Kind(str, enum.Enum):
@@ -13,6 +38,49 @@ class Kind(str, enum.Enum):
     illustration = "illustration"
 
 
+def _pack_rgb24(rgb: np.ndarray) -> np.ndarray:
+    """Pack an (H, W, 3) uint8 array into flat exact 24-bit color codes."""
+    r = rgb[..., 0].astype(np.uint32)
+    g = rgb[..., 1].astype(np.uint32)
+    b = rgb[..., 2].astype(np.uint32)
+    return ((r << 16) | (g << 8) | b).ravel()
+
+
+@njit(cache=True, nogil=True)
+def _has_n_colors(packed: np.ndarray, n: int) -> bool:
+    """Return True as soon as `n` distinct 24-bit colors have been seen."""
+    seen = np.zeros((1 << 24) // 64, dtype=np.uint64)
+    count = 0
+    for i in range(packed.size):
+        v = int(packed[i])
+        bit = np.uint64(1) << np.uint64(v & 63)
+        if seen[v >> 6] & bit == 0:
+            seen[v >> 6] |= bit
+            count += 1
+            if count >= n:
+                return True
+    return False
+
+
+def _preview_rgb(pil_img: Image.Image, max_side: int) -> Tuple[np.ndarray, int]:
+    """
+    Box-downscale by an integer factor so the long side fits max_side.
+    
+    Args:
+        pil_img: Input PIL Image
+        max_side: Maximum long side of the preview
+        
+    Returns:
+        (RGB preview array, reduction factor) tuple
+    """
+    w, h = pil_img.size
+    factor = max(1, -(-max(w, h) // max_side))
+    img = pil_img if pil_img.mode in ("RGB", "RGBA") else pil_img.convert("RGB")
+    if factor > 1:
+        img = img.reduce(factor)
+    return np.asarray(img.convert("RGB")), factor
+
+
 def detect_kind(
     pil_img: Image.Image, 
     pixel_color_threshold: int = 80, 
@@ -31,28 +99,49 @@ def detect_kind(
     Returns:
         Detected Kind
     """
-    arr = np.array(pil_img.convert("RGB"))
-    h, w, _ = arr.shape
-    small = cv2.resize(
-        arr, 
-        (min(128, w), min(128, h)), 
-        interpolation=cv2.INTER_AREA
-    )
+    small, _ = _preview_rgb(pil_img, 128)
     
-    # Estimate unique color count on downscaled image
-    uniq = np.unique(small.reshape(-1, 3), axis=0)
-    few_colors = len(uniq) < pixel_color_threshold
+    # Estimate unique color count on downscaled image (exact colors, stops
+    # scanning once the threshold is reached), concurrently with Canny
+    many_colors = _DETECT_POOL.submit(
+        _has_n_colors, _pack_rgb24(small), pixel_color_threshold
+    )
     
     # Detect sharp edge ratio using Canny
     gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
     edges = cv2.Canny(gray, 80, 140)
     edge_ratio = float((edges > 0).mean())
+    few_colors = not many_colors.result()
     
     if few_colors and edge_ratio > edge_threshold:
         return Kind.pixel_art
     return Kind.illustration
 
 
+def bbox_from_alpha_buf(
+    buf: ImageBuf, 
+    alpha_threshold: int = 5
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Extract bounding box from the alpha channel of a buffer.
+    
+    Args:
+        buf: Input ImageBuf (must be RGBA)
+        alpha_threshold: Minimum alpha value to consider opaque
+        
+    Returns:
+        Bounding box (x0, y0, x1, y1) or None if no alpha
+    """
+    if buf.mode != "RGBA":
+        return None
+    mask = buf.arr[..., 3] > alpha_threshold
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]), int(rows[-1])
+
+
 def bbox_from_alpha(
     pil_img: Image.Image, 
     alpha_threshold: int = 5
@@ -69,12 +158,7 @@ def bbox_from_alpha(
     """
     if pil_img.mode != "RGBA":
         return None
-    a = np.array(pil_img.split()[-1])
-    mask = a > alpha_threshold
-    ys, xs = np.where(mask)
-    if len(xs) == 0 or len(ys) == 0:
-        return None
-    return int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())
+    return bbox_from_alpha_buf(ImageBuf.from_pil(pil_img), alpha_threshold)
 
 
 def is_alpha_bbox_meaningful(
@@ -113,6 +197,14 @@ def is_alpha_bbox_meaningful(
     return trim_ratio >= min_trim_ratio or width_ratio < 0.95 or height_ratio < 0.95
 
 
+def _get_saliency():
+    """Return the shared spectral-residual saliency detector (created once)."""
+    global _SALIENCY
+    if _SALIENCY is None and _HAS_SALIENCY:
+        _SALIENCY = cv2.saliency.StaticSaliencySpectralResidual_create()  # type: ignore[attr-defined]
+    return _SALIENCY
+
+
 def bbox_from_saliency(pil_img: Image.Image) -> Tuple[int, int, int, int]:
     """
     Extract bounding box from saliency map.
@@ -123,22 +215,17 @@ def bbox_from_saliency(pil_img: Image.Image) -> Tuple[int, int, int, int]:
     Returns:
         Bounding box (x0, y0, x1, y1)
     """
-    arr = np.array(pil_img.convert("RGB"))
-    # Resize for fast estimation
-    h, w, _ = arr.shape
-    scale = 256.0 / max(h, w)
-    new_w = max(1, int(w * scale))
-    new_h = max(1, int(h * scale))
-    small = cv2.resize(arr, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    w, h = pil_img.size
+    # Reduce for fast estimation
+    small, factor = _preview_rgb(pil_img, 256)
     
     # Check if saliency module is available (requires opencv-contrib-python)
-    if not hasattr(cv2, 'saliency'):
+    if not _HAS_SALIENCY:
         # Saliency module not available - fallback to full image
         return 0, 0, w - 1, h - 1
     
     try:
-        sal = cv2.saliency.StaticSaliencySpectralResidual_create()  # type: ignore[attr-defined]
-        success, sal_map = sal.computeSaliency(small)
+        success, sal_map = _get_saliency().computeSaliency(small)
         
         if not success:
             # Fallback to full image
@@ -156,11 +243,10 @@ def bbox_from_saliency(pil_img: Image.Image) -> Tuple[int, int, int, int]:
         x, y, ww, hh = cv2.boundingRect(c)
         
         # Scale bbox to original coordinates
-        inv = 1.0 / scale
-        x0 = int(x * inv)
-        y0 = int(y * inv)
-        x1 = min(w - 1, int((x + ww) * inv))
-        y1 = min(h - 1, int((y + hh) * inv))
+        x0 = x * factor
+        y0 = y * factor
+        x1 = min(w - 1, (x + ww) * factor)
+        y1 = min(h - 1, (y + hh) * factor)
         
         # Small safety margin
         m = int(0.01 * max(w, h))
@@ -175,6 +261,22 @@ def bbox_from_saliency(pil_img: Image.Image) -> Tuple[int, int, int, int]:
         return 0, 0, w - 1, h - 1
 
 
+def _expand_bbox(
+    bbox: Tuple[int, int, int, int], 
+    margin: int, 
+    width: int, 
+    height: int
+) -> Tuple[int, int, int, int]:
+    """Grow an inclusive bbox by margin and clamp it to the image bounds."""
+    x0, y0, x1, y1 = bbox
+    return (
+        max(0, x0 - margin),
+        max(0, y0 - margin),
+        min(width - 1, x1 + margin),
+        min(height - 1, y1 + margin)
+    )
+
+
 def crop_to_bbox(
     pil_img: Image.Image, 
     bbox: Tuple[int, int, int, int], 
@@ -191,9 +293,25 @@ def crop_to_bbox(
     Returns:
         Cropped image
     """
-    x0, y0, x1, y1 = bbox
-    x0 = max(0, x0 - margin)
-    y0 = max(0, y0 - margin)
-    x1 = min(pil_img.width - 1, x1 + margin)
-    y1 = min(pil_img.height - 1, y1 + margin)
+    x0, y0, x1, y1 = _expand_bbox(bbox, margin, pil_img.width, pil_img.height)
     return pil_img.crop((x0, y0, x1 + 1, y1 + 1))
+
+
+def crop_to_bbox_buf(
+    buf: ImageBuf, 
+    bbox: Tuple[int, int, int, int], 
+    margin: int = 0
+) -> ImageBuf:
+    """
+    Crop a buffer to bounding box with optional margin (no copy).
+    
+    Args:
+        buf: Input ImageBuf
+        bbox: Bounding box (x0, y0, x1, y1)
+        margin: Additional margin pixels
+        
+    Returns:
+        ImageBuf viewing the cropped region
+    """
+    x0, y0, x1, y1 = _expand_bbox(bbox, margin, buf.width, buf.height)
+    return ImageBuf(buf.arr[y0:y1 + 1, x0:x1 + 1], buf.mode)
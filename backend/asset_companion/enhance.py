@@ -1,6 +1,65 @@
 """Image enhancement operations."""
 import numpy as np
-from PIL import Image, ImageFilter
+import cv2
+from numba import njit
+from PIL import Image
+from asset_companion.io import ImageBuf
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _sharpen_u8(src: np.ndarray, blur: np.ndarray, amount: np.float32, out: np.ndarray) -> None:
+    """out = clip(src + amount * (src - blur)) over (rows, row_bytes) arrays; out may be src."""
+    h, n = src.shape
+    for y in range(h):
+        for i in range(n):
+            s = np.float32(src[y, i])
+            v = s + amount * (s - np.float32(blur[y, i])) + np.float32(0.5)
+            out[y, i] = np.uint8(min(max(v, np.float32(0.0)), np.float32(255.0)))
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _sharpen_rgba_rgb_u8(src: np.ndarray, blur: np.ndarray, amount: np.float32, out: np.ndarray) -> None:
+    """Like _sharpen_u8 for (H, W, 4) RGBA, but alpha is copied through unchanged."""
+    h, w = src.shape[0], src.shape[1]
+    for y in range(h):
+        for x in range(w):
+            for ch in range(3):
+                s = np.float32(src[y, x, ch])
+                v = s + amount * (s - np.float32(blur[y, x, ch])) + np.float32(0.5)
+                out[y, x, ch] = np.uint8(min(max(v, np.float32(0.0)), np.float32(255.0)))
+            out[y, x, 3] = src[y, x, 3]
+
+
+def unsharp_mask_buf(
+    buf: ImageBuf, 
+    radius: float = 1.0, 
+    amount: float = 0.2,
+    rgb_only: bool = False
+) -> ImageBuf:
+    """
+    Apply unsharp mask in place (see unsharp_mask).
+    
+    Args:
+        buf: Input ImageBuf
+        radius: Blur radius
+        amount: Sharpening amount (0.0-1.0)
+        rgb_only: If True and image is RGBA, only sharpen RGB channels
+        
+    Returns:
+        The same buffer, sharpened
+    """
+    arr = buf.writable()
+    blur = cv2.GaussianBlur(arr, (0, 0), radius)
+    
+    # Sharpen + clip in one fused pass, written back in place
+    if rgb_only and buf.mode == "RGBA":
+        # Only sharpen RGB channels, preserve alpha
+        _sharpen_rgba_rgb_u8(arr, blur, np.float32(amount), arr)
+    else:
+        # Sharpen all channels; rows are treated as flat byte runs
+        rows = arr.reshape(arr.shape[0], -1)
+        _sharpen_u8(rows, blur.reshape(rows.shape), np.float32(amount), rows)
+    return buf
 
 
 def unsharp_mask(
@@ -25,19 +84,5 @@ def unsharp_mask(
     Returns:
         Enhanced PIL Image
     """
-    blur = pil_img.filter(ImageFilter.GaussianBlur(radius))
-    arr = np.array(pil_img).astype(np.float32)
-    arr_blur = np.array(blur).astype(np.float32)
-    
-    if rgb_only and pil_img.mode == "RGBA":
-        # Only sharpen RGB channels, preserve alpha
-        rgb = arr[..., :3]
-        rgb_blur = arr_blur[..., :3]
-        rgb_sharp = np.clip(rgb + amount * (rgb - rgb_blur), 0, 255)
-        arr[..., :3] = rgb_sharp
-        # Alpha remains unchanged
-    else:
-        # Sharpen all channels
-        arr = np.clip(arr + amount * (arr - arr_blur), 0, 255)
-    
-    return Image.fromarray(arr.astype(np.uint8), mode=pil_img.mode)
+    buf = ImageBuf.from_pil(pil_img)
+    return unsharp_mask_buf(buf, radius, amount, rgb_only).to_pil()
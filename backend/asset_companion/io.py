@@ -1,11 +1,184 @@
 """Image I/O operations with ICC profile preservation."""
+import mmap
+import os
+import struct
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Optional, Tuple, Union
 import numpy as np
 from PIL import Image
 
 
-def load_image_rgba(path: Path) -> Image.Image:
+# Bytes read by probe_size when sniffing dimensions from the file header
+PROBE_BYTES = 64 * 1024
+
+# JPEG start-of-frame markers (SOF0-SOF15, excluding DHT/JPG/DAC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Files at least this large are memory-mapped and decoded straight from the mapping
+MMAP_MIN_BYTES = 8 * 1024 * 1024
+
+# Optional override of Pillow's decompression-bomb limit (in pixels).
+# Unset keeps Pillow's default; "0" disables the check for trusted large inputs.
+_max_pixels = os.environ.get("ASSET_COMPANION_MAX_IMAGE_PIXELS")
+if _max_pixels:
+    Image.MAX_IMAGE_PIXELS = int(_max_pixels) or None
+
+
+@dataclass
+class ImageBuf:
+    """
+    Decoded pixel buffer shared between array-based pipeline stages.
+    
+    Holds a NumPy view of the pixels together with the PIL mode, so
+    consecutive stages can work on one buffer in place instead of each
+    copying out of and back into a PIL Image.
+    
+    Attributes:
+        arr: Pixel array of shape (H, W) or (H, W, C), uint8
+        mode: PIL mode of the pixels (e.g. "RGBA")
+    """
+    arr: np.ndarray
+    mode: str
+    
+    @classmethod
+    def from_pil(cls, pil_img: Image.Image) -> "ImageBuf":
+        """
+        Wrap a PIL Image without an extra copy.
+        
+        Args:
+            pil_img: PIL Image
+            
+        Returns:
+            ImageBuf holding a (read-only) view of the decoded pixels
+        """
+        return cls(np.asarray(pil_img), pil_img.mode)
+    
+    @property
+    def width(self) -> int:
+        return self.arr.shape[1]
+    
+    @property
+    def height(self) -> int:
+        return self.arr.shape[0]
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.arr.shape[1], self.arr.shape[0]
+    
+    def writable(self) -> np.ndarray:
+        """
+        Return the pixel array, copying it once if it is read-only or strided.
+        
+        Returns:
+            Writable, C-contiguous pixel array (also stored back on the buffer)
+        """
+        if not (self.arr.flags.writeable and self.arr.flags.c_contiguous):
+            self.arr = self.arr.copy()
+        return self.arr
+    
+    def to_pil(self) -> Image.Image:
+        """
+        Convert back to a PIL Image.
+        
+        Returns:
+            PIL Image with the buffer's mode
+        """
+        return Image.fromarray(self.arr, mode=self.mode)
+
+
+def _open_image(path: Union[str, Path]) -> Image.Image:
+    """
+    Open an image file, memory-mapping it when it is large.
+    
+    Large files are decoded eagerly from the mapping so that the mapping
+    can be released before returning; small files are opened lazily.
+    
+    Args:
+        path: Path to the image file
+        
+    Returns:
+        PIL Image
+    """
+    if os.path.getsize(path) < MMAP_MIN_BYTES:
+        return Image.open(path)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        img = Image.open(mm)
+        img.load()
+    return img
+
+
+def _sniff_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from PNG/GIF/JPEG header bytes, or None if short."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+        if len(data) < 24:
+            return None
+        w, h = struct.unpack(">II", data[16:24])
+        return w, h
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        if len(data) < 10:
+            return None
+        w, h = struct.unpack("<HH", data[6:10])
+        return w, h
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 <= len(data):
+            if data[i] != 0xFF:
+                return None
+            marker = data[i + 1]
+            if marker == 0xFF:
+                # Fill byte
+                i += 1
+                continue
+            if marker in _JPEG_SOF_MARKERS:
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                return w, h
+            if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+                # Standalone marker without a length field
+                i += 2
+                continue
+            if i + 4 > len(data):
+                return None
+            (seg_len,) = struct.unpack(">H", data[i + 2:i + 4])
+            i += 2 + seg_len
+    return None
+
+
+def probe_size(source: Union[Path, BinaryIO]) -> Tuple[int, int]:
+    """
+    Get image dimensions from the file header without decoding.
+    
+    PNG, GIF and JPEG are parsed directly from the first PROBE_BYTES;
+    other formats (or headers that don't fit) fall back to Image.open.
+    
+    Args:
+        source: Path to the image file, or a binary file object positioned
+                at the start of the image
+        
+    Returns:
+        (width, height) tuple
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            data = f.read(PROBE_BYTES)
+        size = _sniff_size(data)
+        if size is None:
+            with Image.open(source) as img:
+                size = img.size
+        return size
+    
+    start = source.tell()
+    data = source.read(PROBE_BYTES)
+    source.seek(start)
+    size = _sniff_size(data)
+    if size is None:
+        with Image.open(source) as img:
+            size = img.size
+        source.seek(start)
+    return size
+
+
+def load_image_rgba(path: Union[str, Path]) -> Image.Image:
     """
     Load an image and convert it to RGBA mode.
     
@@ -15,7 +188,7 @@ def load_image_rgba(path: Path) -> Image.Image:
     Returns:
         PIL Image in RGBA mode
     """
-    img = Image.open(path)
+    img = _open_image(path)
     if img.mode in ("P", "L"):
         img = img.convert("RGBA")
     elif img.mode == "RGB":
@@ -28,22 +201,29 @@ def load_image_rgba(path: Path) -> Image.Image:
 
 
 def save_image_with_icc(
-    img: Image.Image, 
-    output_path: Path, 
-    icc_profile: Optional[bytes] = None
+    img: Union[Image.Image, ImageBuf], 
+    output_path: Union[str, Path], 
+    icc_profile: Optional[bytes] = None,
+    compress_level: Optional[int] = None
 ) -> None:
     """
     Save an image with optional ICC profile preservation.
     
     Args:
-        img: PIL Image to save
+        img: PIL Image (or ImageBuf) to save
         output_path: Destination path
         icc_profile: Optional ICC profile bytes to embed
+        compress_level: PNG zlib level, 0-9 (None: Pillow's default, 6).
+                        Ignored for other formats.
     """
+    if isinstance(img, ImageBuf):
+        img = img.to_pil()
     params = {}
     if icc_profile:
         params["icc_profile"] = icc_profile
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if compress_level is not None and os.path.splitext(output_path)[1].lower() == ".png":
+        params["compress_level"] = compress_level
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
     img.save(output_path, **params)
 
 
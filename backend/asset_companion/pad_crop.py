@@ -1,7 +1,9 @@
 """Image padding, cropping, and smart square operations."""
+from typing import Tuple
 import numpy as np
 import cv2
 from PIL import Image
+from asset_companion.io import ImageBuf
 from asset_companion.scale import resize_lanczos_fit_long, resize_lanczos_to_box
 from asset_companion.detect import bbox_from_saliency
 
@@ -20,14 +22,67 @@ def aspect_delta(w: int, h: int) -> float:
     return abs((w / max(1.0, h)) - 1.0)
 
 
+def _center_array_on_canvas(
+    src: np.ndarray, 
+    canvas_w: int, 
+    canvas_h: int
+) -> np.ndarray:
+    """
+    Copy an (h, w, 3|4) uint8 array into the center of a transparent RGBA canvas.
+    
+    RGB input is placed fully opaque (as Image.convert("RGBA") would).
+    
+    Args:
+        src: Input array (must fit inside the canvas)
+        canvas_w: Canvas width
+        canvas_h: Canvas height
+        
+    Returns:
+        (canvas_h, canvas_w, 4) uint8 RGBA array
+    """
+    h, w = src.shape[:2]
+    canvas = np.zeros((canvas_h, canvas_w, 4), np.uint8)
+    x = (canvas_w - w) // 2
+    y = (canvas_h - h) // 2
+    if src.shape[2] == 4:
+        canvas[y:y + h, x:x + w] = src
+    else:
+        canvas[y:y + h, x:x + w, :3] = src
+        canvas[y:y + h, x:x + w, 3] = 255
+    return canvas
+
+
+def _center_on_canvas(
+    pil_img: Image.Image, 
+    canvas_w: int, 
+    canvas_h: int
+) -> np.ndarray:
+    """
+    Copy an image into the center of a transparent RGBA canvas.
+    
+    Equivalent to Image.new + paste (paste without a mask is a plain copy),
+    but done as one slice assignment into a zeroed array.
+    
+    Args:
+        pil_img: Input PIL Image (must fit inside the canvas)
+        canvas_w: Canvas width
+        canvas_h: Canvas height
+        
+    Returns:
+        (canvas_h, canvas_w, 4) uint8 RGBA array
+    """
+    src = np.asarray(pil_img if pil_img.mode in ("RGB", "RGBA") else pil_img.convert("RGBA"))
+    return _center_array_on_canvas(src, canvas_w, canvas_h)
+
+
 def pad_to_square(
     pil_img: Image.Image, 
     side: int, 
     inpaint: bool = False, 
-    method: str = "telea"
+    method: str = "reflect"
 ) -> Image.Image:
     """
-    Pad image to square, optionally using inpainting.
+    Pad image to square, optionally filling the padding.
     
     IMPORTANT: This function assumes the invariant w <= side AND h <= side.
     Caller must ensure this before calling pad_to_square().
@@ -35,8 +90,12 @@ def pad_to_square(
     Args:
         pil_img: Input PIL Image (must have w <= side AND h <= side)
         side: Target square side length
-        inpaint: Whether to inpaint transparent areas
-        method: Inpainting method ("telea" or "ns")
+        inpaint: Whether to fill the padding instead of leaving it transparent
+        method: Fill method: "reflect" (mirror a fully opaque image into the
+                border; images with transparency are inpainted as with
+                "telea_full"), or "telea_full"/"ns_full" (OpenCV inpainting
+                of every transparent pixel, much slower; "telea"/"ns" are
+                aliases)
         
     Returns:
         Square image
@@ -49,27 +108,43 @@ def pad_to_square(
     if w == side and h == side:
         return pil_img
     
-    # Center on new canvas
-    canvas = Image.new("RGBA", (side, side), (0, 0, 0, 0))
     x = (side - w) // 2
     y = (side - h) // 2
-    canvas.paste(pil_img, (x, y))
+    
+    if inpaint and method == "reflect":
+        rgba = np.asarray(pil_img.convert("RGBA"))
+        if rgba[..., 3].min() == 255:
+            # The pad is a rectangular border, so mirroring the content into
+            # it is enough; result is fully opaque like the inpainted variants
+            ext = cv2.copyMakeBorder(
+                rgba, y, side - h - y, x, side - w - x, cv2.BORDER_REFLECT_101
+            )
+            return Image.fromarray(ext, mode="RGBA")
+        # Transparent pixels carry arbitrary RGB that mirroring would expose,
+        # and inpainting them together with the border costs more than the
+        # plain full inpaint
+        method = "telea_full"
+    
+    # Center on new canvas
+    arr = _center_on_canvas(pil_img, side, side)
     
     if not inpaint:
-        return canvas
+        return Image.fromarray(arr, mode="RGBA")
     
-    # Inpaint transparent areas
-    arr = np.array(canvas)
-    alpha = arr[..., 3]
-    mask = (alpha == 0).astype(np.uint8) * 255
-    # Inpaint works on 3-channel image
-    bgr = cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR)
-    if method == "telea":
-        out = cv2.inpaint(bgr, mask, 3, cv2.INPAINT_TELEA)
+    if method in ("telea_full", "telea"):
+        flags = cv2.INPAINT_TELEA
+    elif method in ("ns_full", "ns"):
+        flags = cv2.INPAINT_NS
     else:
-        out = cv2.inpaint(bgr, mask, 3, cv2.INPAINT_NS)
-    rgba = cv2.cvtColor(out, cv2.COLOR_BGR2RGBA)
-    return Image.fromarray(rgba, mode="RGBA")
+        raise ValueError(f"Unknown inpaint method: {method}")
+    
+    # Inpaint transparent areas
+    mask = (arr[..., 3] == 0).astype(np.uint8)
+    # Inpaint works on 3-channel image; channels are filled independently,
+    # so RGB order can be passed as-is (no BGR round-trip)
+    arr[..., :3] = cv2.inpaint(np.ascontiguousarray(arr[..., :3]), mask, 3, flags)
+    arr[..., 3] = 255
+    return Image.fromarray(arr, mode="RGBA")
 
 
 def smart_square(
@@ -144,6 +219,45 @@ def smart_square(
         return pad_to_square(img_fit, side, inpaint=False)
 
 
+def _fit_box(w: int, h: int, target_w: int, target_h: int) -> Tuple[int, int]:
+    """
+    Size that fits (w, h) inside the target box, preserving aspect ratio.
+    
+    Args:
+        w: Image width
+        h: Image height
+        target_w: Target width
+        target_h: Target height
+        
+    Returns:
+        (new_w, new_h) tuple with new_w <= target_w and new_h <= target_h
+    """
+    # Calculate aspect ratios
+    img_aspect = w / h if h > 0 else 1.0
+    target_aspect = target_w / target_h if target_h > 0 else 1.0
+    
+    # Fit long side to target, maintaining aspect ratio
+    if img_aspect >= target_aspect:
+        # Image is wider or same aspect - fit to width
+        scale = target_w / w
+        new_w = target_w
+        new_h = max(1, int(h * scale))
+    else:
+        # Image is taller - fit to height
+        scale = target_h / h
+        new_h = target_h
+        new_w = max(1, int(w * scale))
+    
+    # Ensure we don't exceed target dimensions
+    if new_w > target_w:
+        new_h = int(new_h * (target_w / new_w))
+        new_w = target_w
+    if new_h > target_h:
+        new_w = int(new_w * (target_h / new_h))
+        new_h = target_h
+    return new_w, new_h
+
+
 def fit_to_size(
     pil_img: Image.Image,
     target_w: int,
@@ -175,36 +289,12 @@ def fit_to_size(
     if w == target_w and h == target_h:
         return pil_img
     
-    # Calculate aspect ratios
-    img_aspect = w / h if h > 0 else 1.0
-    target_aspect = target_w / target_h if target_h > 0 else 1.0
-    
     # Determine if we need to downscale
     needs_downscale = w > target_w or h > target_h
     
     if needs_downscale:
         # Downscale to fit within target dimensions
-        # Fit long side to target, maintaining aspect ratio
-        if img_aspect >= target_aspect:
-            # Image is wider or same aspect - fit to width
-            scale = target_w / w
-            new_w = target_w
-            new_h = max(1, int(h * scale))
-        else:
-            # Image is taller - fit to height
-            scale = target_h / h
-            new_h = target_h
-            new_w = max(1, int(w * scale))
-        
-        # Ensure we don't exceed target dimensions
-        if new_w > target_w:
-            new_h = int(new_h * (target_w / new_w))
-            new_w = target_w
-        if new_h > target_h:
-            new_w = int(new_w * (target_h / new_h))
-            new_h = target_h
-        
-        img_fit = resize_lanczos_to_box(pil_img, (new_w, new_h))
+        img_fit = resize_lanczos_to_box(pil_img, _fit_box(w, h, target_w, target_h))
         w, h = img_fit.size
     else:
         img_fit = pil_img
@@ -215,11 +305,8 @@ def fit_to_size(
     # Default: always pad to preserve full content
     if not allow_crop:
         # Pad to target dimensions
-        canvas = Image.new("RGBA", (target_w, target_h), (0, 0, 0, 0))
-        x = (target_w - w) // 2
-        y = (target_h - h) // 2
-        canvas.paste(img_fit, (x, y))
-        return canvas
+        canvas = _center_on_canvas(img_fit, target_w, target_h)
+        return Image.fromarray(canvas, mode="RGBA")
     
     # Optional cropping path (only if explicitly allowed)
     if w >= target_w and h >= target_h:
@@ -229,8 +316,52 @@ def fit_to_size(
         return img_fit.crop((x0, y0, x0 + target_w, y0 + target_h))
     else:
         # If one side is smaller, pad (invariant already guaranteed)
-        canvas = Image.new("RGBA", (target_w, target_h), (0, 0, 0, 0))
-        x = (target_w - w) // 2
-        y = (target_h - h) // 2
-        canvas.paste(img_fit, (x, y))
-        return canvas
+        canvas = _center_on_canvas(img_fit, target_w, target_h)
+        return Image.fromarray(canvas, mode="RGBA")
+
+
+def smart_square_buf(buf: ImageBuf, side: int) -> ImageBuf:
+    """
+    Pad (downscaling first if needed) a buffer to a square (see smart_square).
+    
+    Same result as smart_square with allow_crop=False. Only the Lanczos
+    downscale, when one is needed, goes through PIL.
+    
+    Args:
+        buf: Input ImageBuf
+        side: Target square side length
+        
+    Returns:
+        Square buffer (buf itself if it already is side x side)
+    """
+    if buf.size == (side, side):
+        return buf
+    if max(buf.width, buf.height) > side:
+        buf = ImageBuf.from_pil(resize_lanczos_fit_long(buf.to_pil(), side))
+        if buf.size == (side, side):
+            return buf
+    return ImageBuf(_center_array_on_canvas(buf.arr, side, side), "RGBA")
+
+
+def fit_to_size_buf(buf: ImageBuf, target_w: int, target_h: int) -> ImageBuf:
+    """
+    Downscale if needed and pad a buffer to target dimensions (see fit_to_size).
+    
+    Same result as fit_to_size with allow_crop=False. Only the Lanczos
+    downscale, when one is needed, goes through PIL.
+    
+    Args:
+        buf: Input ImageBuf
+        target_w: Target width
+        target_h: Target height
+        
+    Returns:
+        Buffer of exactly target_w x target_h (buf itself if already that size)
+    """
+    w, h = buf.size
+    if w == target_w and h == target_h:
+        return buf
+    if w > target_w or h > target_h:
+        fitted = resize_lanczos_to_box(buf.to_pil(), _fit_box(w, h, target_w, target_h))
+        buf = ImageBuf.from_pil(fitted)
+    return ImageBuf(_center_array_on_canvas(buf.arr, target_w, target_h), "RGBA")
@@ -1,11 +1,20 @@
 """Main image processing pipeline."""
+import asyncio
 import enum
+import functools
 import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any, Union
+from typing import Optional, Tuple, Dict, Any, List, Sequence, Union
+import numpy as np
 from PIL import Image
 
 from asset_companion.io import (
+    ImageBuf,
     load_image_rgba,
     save_image_with_icc,
     get_icc_profile
@@ -13,16 +22,30 @@ from asset_companion.io import (
 from asset_companion.detect import (
     Kind,
     detect_kind,
-    bbox_from_alpha,
+    bbox_from_alpha_buf,
     is_alpha_bbox_meaningful,
-    crop_to_bbox
+    crop_to_bbox_buf
 )
-from asset_companion.alpha_fix import unpremultiply_rgba, defringe_alpha, smooth_alpha_edges
-from asset_companion.scale import choose_integer_scale, resize_nearest
-from asset_companion.pad_crop import smart_square, fit_to_size
+from asset_companion.alpha_fix import (
+    unpremultiply_rgba_buf,
+    unpremultiply_defringe_buf,
+    smooth_alpha_edges_buf
+)
+from asset_companion.scale import (
+    choose_integer_scale,
+    choose_integer_scale_many,
+    resize_nearest,
+    resize_nearest_np
+)
+from asset_companion.pad_crop import smart_square_buf, fit_to_size_buf
 from asset_companion.size_utils import calculate_target_size
-from asset_companion.enhance import unsharp_mask
-from asset_companion.realesrgan import run_realesrgan
+from asset_companion.enhance import unsharp_mask_buf
+from asset_companion.realesrgan import (
+    get_onnx_session,
+    get_realesrgan_path,
+    run_realesrgan_array,
+    run_realesrgan_batch
+)
 
 
 class SuperRes(str, enum.Enum):
@@ -31,9 +54,305 @@ class SuperRes(str, enum.Enum):
     realesrgan = "realesrgan"
 
 
+# Super-resolution model and factor used for illustrations
+SR_MODEL = "realesrgan-x4plus"
+SR_SCALE = 4
+# Upper bound on images stacked into one super-resolution call
+SR_MAX_BATCH = 8
+# zlib level for the saved PNG: 1 encodes several times faster than
+# Pillow's default of 6, for somewhat larger files
+PNG_COMPRESS_LEVEL = 1
+
+# State handed from _prepare to _finish: (pixels, ICC profile, kind, metadata).
+# Pixels stay in an ImageBuf between stages; PIL is only used where a stage
+# needs it (decode, Lanczos resize, encode)
+_Prepared = Tuple[ImageBuf, Optional[bytes], Kind, Dict[str, Any]]
+
+# Per-source analysis reused when the same file is processed again (e.g. at
+# several targets): (path, st_mtime_ns, st_size) -> (ICC bytes, detected
+# kind or None, alpha bbox). LRU-bounded; a manual OrderedDict rather than
+# functools.lru_cache, since the values come from the image _prepare has
+# already decoded and a cache miss must not decode it a second time.
+_AnalysisKey = Tuple[str, int, int]
+_Analysis = Tuple[Optional[bytes], Optional[Kind], Optional[Tuple[int, int, int, int]]]
+ANALYSIS_CACHE_SIZE = 256
+_analysis_cache: "OrderedDict[_AnalysisKey, _Analysis]" = OrderedDict()
+_analysis_lock = threading.Lock()
+
+# Side pool for the alpha bbox scan in _prepare; recreated in forked
+# children, like detect's pool
+_ANALYSIS_POOL: ThreadPoolExecutor
+
+
+def _new_analysis_pool() -> None:
+    global _ANALYSIS_POOL
+    _ANALYSIS_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="analysis")
+
+
+_new_analysis_pool()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_new_analysis_pool)
+
+
+def _write_log(log_jsonl: Path, meta: Dict[str, Any]) -> None:
+    """Append one metadata record to the JSONL log."""
+    log_jsonl.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_jsonl, "a", encoding="utf-8") as f:
+        f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+
+
+def _record_failure(
+    src: Union[str, Path],
+    error: Exception,
+    log_jsonl: Optional[Path]
+) -> Dict[str, Any]:
+    """Build (and log, if requested) the metadata for a failed item."""
+    error_meta = {
+        "src": str(src),
+        "error": str(error),
+        "ok": False
+    }
+    if log_jsonl:
+        try:
+            _write_log(log_jsonl, error_meta)
+        except Exception:
+            pass
+    return error_meta
+
+
+def _superres_requested(superres: Union[str, SuperRes]) -> bool:
+    """Normalize superres to string and check for Real-ESRGAN."""
+    superres_str = superres.value if isinstance(superres, SuperRes) else superres
+    return superres_str == SuperRes.realesrgan.value
+
+
+def _needs_superres(
+    size: Tuple[int, int],
+    target: int,
+    target_w: Optional[int],
+    target_h: Optional[int]
+) -> bool:
+    """
+    Check whether super-resolution can change the result.
+    
+    If the image already covers the target's long side, a 4x upscale would
+    only be thrown away by the downscale that fits it to the target.
+    """
+    if target_w is not None and target_h is not None:
+        target_long = max(target_w, target_h)
+    else:
+        target_long = target
+    return max(size) < target_long
+
+
+def _analysis_key(src: Union[str, Path]) -> Optional[_AnalysisKey]:
+    """Cache key for a source file, or None if it cannot be stat'ed."""
+    try:
+        st = os.stat(src)
+    except OSError:
+        return None
+    return os.fspath(src), st.st_mtime_ns, st.st_size
+
+
+def _cached_analysis(key: Optional[_AnalysisKey]) -> Optional[_Analysis]:
+    """Look up (and mark as recently used) a cached analysis."""
+    if key is None:
+        return None
+    with _analysis_lock:
+        entry = _analysis_cache.get(key)
+        if entry is not None:
+            _analysis_cache.move_to_end(key)
+        return entry
+
+
+def _store_analysis(key: Optional[_AnalysisKey], entry: _Analysis) -> None:
+    """Insert an analysis, evicting the least recently used beyond the limit."""
+    if key is None:
+        return
+    with _analysis_lock:
+        _analysis_cache[key] = entry
+        _analysis_cache.move_to_end(key)
+        while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+
+
+def _pixel_scale_basis(
+    buf: ImageBuf,
+    target: int,
+    target_w: Optional[int],
+    target_h: Optional[int]
+) -> Tuple[Tuple[int, int], int]:
+    """
+    (size, target) to choose a pixel-art integer scale from.
+    
+    Square output fits the whole image into target; non-square output
+    scales by the long side against the target's long side.
+    """
+    if target_w is not None and target_h is not None:
+        long_side = max(buf.width, buf.height)
+        return (long_side, long_side), max(target_w, target_h)
+    return buf.size, target
+
+
+def _prepare(
+    src: Union[str, Path],
+    kind: Kind
+) -> _Prepared:
+    """
+    Load, classify, trim and alpha-fix one image (pipeline steps 1-4).
+    
+    Args:
+        src: Source image path
+        kind: Image kind (auto-detect if Kind.auto)
+        
+    Returns:
+        (image, ICC profile, kind, metadata) tuple for _finish
+    """
+    # Analysis of an unchanged source file is reused from earlier calls
+    key = _analysis_key(src)
+    cached = _cached_analysis(key)
+    
+    # Load image
+    pil = load_image_rgba(src)
+    # Decoded once; array stages below work on this buffer in place
+    buf = ImageBuf.from_pil(pil)
+    bbox_future = None
+    if cached is not None:
+        icc, detected, bbox = cached
+    else:
+        icc = get_icc_profile(pil)
+        detected = None
+        # The alpha scan (NumPy, releases the GIL) overlaps kind detection
+        bbox_future = _ANALYSIS_POOL.submit(bbox_from_alpha_buf, buf)
+    meta: Dict[str, Any] = {
+        "src": str(src),
+        "w": pil.width,
+        "h": pil.height
+    }
+    
+    # Kind detection (before cropping, to inform processing decisions)
+    if kind == Kind.auto:
+        if detected is None:
+            detected = detect_kind(pil)
+        k = detected
+    else:
+        k = kind
+    meta["kind"] = k.value
+    if bbox_future is not None:
+        bbox = bbox_future.result()
+    _store_analysis(key, (icc, detected, bbox))
+    
+    # BBox detection and optional trimming
+    # Only trim using alpha bbox if it's meaningful (removes significant padding)
+    # Never use saliency-based cropping by default (preserves full asset)
+    if bbox and is_alpha_bbox_meaningful(pil, bbox):
+        buf = crop_to_bbox_buf(buf, bbox, margin=2)
+        meta["bbox"] = bbox
+        meta["trimmed"] = True
+    else:
+        # No meaningful trimming - use full image
+        meta["bbox"] = (0, 0, pil.width - 1, pil.height - 1)
+        meta["trimmed"] = False
+    
+    # Alpha fix - different treatment for pixel art vs illustration
+    if k == Kind.pixel_art:
+        # Pixel art: preserve hard edges with light defringe (fused with
+        # the unpremultiply into a single pass)
+        unpremultiply_defringe_buf(buf, radius=1)
+    else:
+        # Illustration: skip defringe (avoids hardening edges)
+        # Alpha smoothing will be applied later after scaling
+        unpremultiply_rgba_buf(buf)
+    return buf, icc, k, meta
+
+
+def _finish(
+    prepared: _Prepared,
+    dst: Union[str, Path],
+    target: int,
+    target_w: Optional[int],
+    target_h: Optional[int],
+    log_jsonl: Optional[Path],
+    sf: Optional[int] = None,
+    compress_level: int = PNG_COMPRESS_LEVEL
+) -> Dict[str, Any]:
+    """
+    Scale, square/fit, smooth, sharpen and save one image (steps 5, 7-10).
+    
+    Super-resolution (step 6), if any, has already been applied to the
+    prepared image. For pixel art, sf is the integer scale factor if the
+    caller already computed it (see _pixel_scale_basis).
+    
+    Returns:
+        Dictionary with processing metadata
+    """
+    buf, icc, k, meta = prepared
+    
+    # Determine target dimensions
+    if target_w is not None and target_h is not None:
+        # Non-square target specified
+        final_w, final_h = target_w, target_h
+        is_square = False
+    else:
+        # Square target (default)
+        final_w = final_h = target
+        is_square = True
+    
+    # Scale strategy
+    if k == Kind.pixel_art:
+        # Pixel art: integer scale with nearest-neighbor
+        if sf is None:
+            sf = choose_integer_scale(*_pixel_scale_basis(buf, target, target_w, target_h))
+        if buf.mode == "RGBA":
+            # Packed 32-bit copy kernel; beats PIL's NEAREST on RGBA
+            buf = ImageBuf(resize_nearest_np(buf.arr, sf), "RGBA")
+        else:
+            buf = ImageBuf.from_pil(resize_nearest(buf.to_pil(), sf))
+        if is_square:
+            # Always pad to square (preserve full pixel art)
+            buf = smart_square_buf(buf, target)
+        else:
+            # Non-square: integer scale for long side, then fit
+            # to target dimensions (preserve full pixel art)
+            buf = fit_to_size_buf(buf, final_w, final_h)
+    else:
+        # Illustration: fit to target dimensions (preserve full asset)
+        if is_square:
+            buf = smart_square_buf(buf, target)
+        else:
+            buf = fit_to_size_buf(buf, final_w, final_h)
+
+    if k != Kind.pixel_art:
+        # Apply alpha edge smoothing for illustrations (reduces jagged edges)
+        smooth_alpha_edges_buf(buf, radius=0.5)
+    
+    # Enhance - different sharpening for pixel art vs illustration
+    if k == Kind.pixel_art:
+        # Pixel art: full sharpening (including alpha)
+        unsharp_mask_buf(buf, radius=1.0, amount=0.2, rgb_only=False)
+    else:
+        # Illustration: light RGB-only sharpening (preserves smooth alpha edges)
+        unsharp_mask_buf(buf, radius=1.0, amount=0.1, rgb_only=True)
+    
+    # Save (the only conversion back to PIL after the resize stages)
+    save_image_with_icc(buf, dst, icc, compress_level=compress_level)
+    meta.update({
+        "dst": str(dst),
+        "ok": True,
+        "final_w": buf.width,
+        "final_h": buf.height
+    })
+    
+    # Log if requested
+    if log_jsonl:
+        _write_log(log_jsonl, meta)
+    
+    return meta
+
+
 def process_one(
-    src: Path,
-    dst: Path,
+    src: Union[str, Path],
+    dst: Union[str, Path],
     target: int = 512,
     target_w: Optional[int] = None,
     target_h: Optional[int] = None,
@@ -41,6 +360,7 @@ def process_one(
     superres: Union[str, SuperRes] = "none",
     outpaint: bool = False,
     log_jsonl: Optional[Path] = None,
+    compress_level: int = PNG_COMPRESS_LEVEL,
 ) -> Dict[str, Any]:
     """
     Process a single image through the complete pipeline.
@@ -71,142 +391,223 @@ def process_one(
         superres: Super-resolution method ("none" or "realesrgan")
         outpaint: Whether to use inpainting (not implemented)
         log_jsonl: Optional path to log JSONL file
+        compress_level: PNG compression level of the output (0-9)
         
     Returns:
         Dictionary with processing metadata
     """
     try:
-        # Load image
-        pil = load_image_rgba(src)
-        icc = get_icc_profile(pil)
-        meta: Dict[str, Any] = {
-            "src": str(src),
-            "w": pil.width,
-            "h": pil.height
-        }
-        
-        # Determine target dimensions
-        if target_w is not None and target_h is not None:
-            # Non-square target specified
-            final_w, final_h = target_w, target_h
-            is_square = False
-        else:
-            # Square target (default)
-            final_w = final_h = target
-            is_square = True
-        
-        # Kind detection (before cropping, to inform processing decisions)
-        k = detect_kind(pil) if kind == Kind.auto else kind
-        meta["kind"] = k.value
-        
-        # BBox detection and optional trimming
-        # Only trim using alpha bbox if it's meaningful (removes significant padding)
-        # Never use saliency-based cropping by default (preserves full asset)
-        bbox = bbox_from_alpha(pil)
-        if bbox and is_alpha_bbox_meaningful(pil, bbox):
-            pil = crop_to_bbox(pil, bbox, margin=2)
-            meta["bbox"] = bbox
-            meta["trimmed"] = True
-        else:
-            # No meaningful trimming - use full image
-            meta["bbox"] = (0, 0, pil.width - 1, pil.height - 1)
-            meta["trimmed"] = False
+        buf, icc, k, meta = _prepare(src, kind)
         
-        # Alpha fix - different treatment for pixel art vs illustration
-        pil = unpremultiply_rgba(pil)
-        if k == Kind.pixel_art:
-            # Pixel art: preserve hard edges with light defringe
-            pil = defringe_alpha(pil, radius=1)
-        else:
-            # Illustration: skip defringe (avoids hardening edges)
-            # Alpha smoothing will be applied later after scaling
-            pass
-        
-        # Scale strategy
-        if k == Kind.pixel_art:
-            # Pixel art: integer scale with nearest-neighbor
-            if is_square:
-                sf = choose_integer_scale(pil.size, target)
-                pil = resize_nearest(pil, sf)
-                # Always pad to square (preserve full pixel art)
-                pil = smart_square(pil, target, use_saliency=False, allow_crop=False)
-            else:
-                # Non-square: use integer scale for long side, then fit
-                long_side = max(pil.width, pil.height)
-                target_long = max(final_w, final_h)
-                sf = choose_integer_scale((long_side, long_side), target_long)
-                pil = resize_nearest(pil, sf)
-                # Fit to target dimensions (preserve full pixel art)
-                pil = fit_to_size(pil, final_w, final_h, allow_crop=False)
-        else:
-            # Illustration: super-resolution (optional) then fit to target
-            # Normalize superres to string for comparison
-            superres_str = superres.value if isinstance(superres, SuperRes) else superres
-            if superres_str == SuperRes.realesrgan.value:
-                # Write temporary file (lossless)
-                # Real-ESRGAN will be auto-downloaded if needed via get_realesrgan_path()
-                tmp_in = dst.parent / f".__tmp_in_{src.stem}.png"
-                tmp_out = dst.parent / f".__tmp_sr_{src.stem}.png"
-                save_image_with_icc(pil, tmp_in, icc)
-                run_realesrgan(tmp_in, tmp_out, scale=4, model="realesrgan-x4plus")
-                pil = load_image_rgba(tmp_out)
-                # Cleanup temp files
-                try:
-                    tmp_in.unlink(missing_ok=True)
-                    tmp_out.unlink(missing_ok=True)
-                except Exception:
-                    pass
-            
-            # Fit to target dimensions (preserve full asset)
-            if is_square:
-                pil = smart_square(pil, target, use_saliency=False, allow_crop=False)
+        if k != Kind.pixel_art and _superres_requested(superres):
+            if _needs_superres(buf.size, target, target_w, target_h):
+                # In-process on the array when the ONNX model is available;
+                # otherwise the binary (auto-downloaded if needed) via temp files
+                sr = run_realesrgan_array(buf.arr, scale=SR_SCALE, model=SR_MODEL)
+                buf = ImageBuf(sr, buf.mode)
             else:
-                pil = fit_to_size(pil, final_w, final_h, allow_crop=False)
-            
-            # Apply alpha edge smoothing for illustrations (reduces jagged edges)
-            pil = smooth_alpha_edges(pil, radius=0.5)
+                meta["superres_skipped"] = True
         
-        # Enhance - different sharpening for pixel art vs illustration
-        if k == Kind.pixel_art:
-            # Pixel art: full sharpening (including alpha)
-            pil = unsharp_mask(pil, radius=1.0, amount=0.2, rgb_only=False)
-        else:
-            # Illustration: light RGB-only sharpening (preserves smooth alpha edges)
-            pil = unsharp_mask(pil, radius=1.0, amount=0.1, rgb_only=True)
+        return _finish(
+            (buf, icc, k, meta), dst, target, target_w, target_h, log_jsonl,
+            compress_level=compress_level
+        )
         
-        # Save
-        save_image_with_icc(pil, dst, icc)
-        meta.update({
-            "dst": str(dst),
-            "ok": True,
-            "final_w": pil.width,
-            "final_h": pil.height
-        })
+    except Exception as e:
+        _record_failure(src, e, log_jsonl)
+        # Re-raise with context
+        raise RuntimeError(f"{src}: {e}") from e
+
+
+async def process_one_async(
+    src: Union[str, Path],
+    dst: Union[str, Path],
+    target: int = 512,
+    target_w: Optional[int] = None,
+    target_h: Optional[int] = None,
+    kind: Kind = Kind.auto,
+    superres: Union[str, SuperRes] = "none",
+    log_jsonl: Optional[Path] = None,
+    compress_level: int = PNG_COMPRESS_LEVEL,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    """
+    Run process_one on an executor without blocking the event loop.
+    
+    Pass a ProcessPoolExecutor to run the whole pipeline in a worker
+    process: only the paths and the metadata cross the process boundary,
+    never the pixels, and concurrent calls are analyzed, upscaled and
+    saved in parallel, one image per worker. The caller owns the pool,
+    including replacing it if a worker dies (BrokenProcessPool).
+    
+    Args:
+        src, dst, target, target_w, target_h, kind, superres, log_jsonl,
+        compress_level: As for process_one
+        executor: Executor to run on (default: the event loop's default
+                  executor, a thread pool)
         
-        # Log if requested
-        if log_jsonl:
-            log_jsonl.parent.mkdir(parents=True, exist_ok=True)
-            with open(log_jsonl, "a", encoding="utf-8") as f:
-                f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+    Returns:
+        Dictionary with processing metadata
+    """
+    job = functools.partial(
+        process_one,
+        src=src,
+        dst=dst,
+        target=target,
+        target_w=target_w,
+        target_h=target_h,
+        kind=kind,
+        superres=superres,
+        log_jsonl=log_jsonl,
+        compress_level=compress_level
+    )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, job)
+
+
+def process_batch(
+    srcs: Sequence[Union[str, Path]],
+    dsts: Sequence[Union[str, Path]],
+    target: int = 512,
+    target_sizes: Optional[Sequence[Optional[Tuple[int, int]]]] = None,
+    kind: Kind = Kind.auto,
+    superres: Union[str, SuperRes] = "none",
+    log_jsonl: Optional[Path] = None,
+    compress_level: int = PNG_COMPRESS_LEVEL,
+) -> List[Dict[str, Any]]:
+    """
+    Process several images, sharing one-time setup across the batch.
+    
+    Each item goes through the same steps as process_one, as a pipeline:
+    decode worker threads load/detect/trim/alpha-fix items and hand them
+    over through a bounded queue; the calling thread groups them (same-size
+    illustrations into one super-resolution call, pixel art into one
+    integer-scale computation, up to SR_MAX_BATCH each) and passes each
+    group on to encode worker threads for scale/fit/sharpen/save. Decoding,
+    inference and encoding of different items overlap. A failing item does
+    not abort the batch; its entry carries "ok": False and the error.
+    
+    Args:
+        srcs: Source image paths
+        dsts: Destination image paths (same length as srcs)
+        target: Target square size for items without an explicit size
+        target_sizes: Optional per-item (width, height); None entries use target
+        kind: Image kind for every item (auto-detect if Kind.auto)
+        superres: Super-resolution method ("none" or "realesrgan")
+        log_jsonl: Optional path to log JSONL file
+        compress_level: PNG compression level of the outputs (0-9)
         
-        return meta
+    Returns:
+        List of per-item metadata dictionaries, in input order
+    """
+    if len(srcs) != len(dsts):
+        raise ValueError("srcs and dsts must have the same length")
+    
+    use_sr = _superres_requested(superres)
+    # Load the ONNX session, or resolve (and if needed download) the binary,
+    # once for the whole batch, when the first item needs SR; without either,
+    # only the items that need SR fail
+    sr_ready: List[bool] = []
+    
+    def sr_available() -> bool:
+        if not sr_ready:
+            sr_ready.append(get_onnx_session(SR_MODEL) is not None or bool(get_realesrgan_path()))
+        return sr_ready[0]
+    
+    n = len(srcs)
+    results: List[Optional[Dict[str, Any]]] = [None] * n
+    workers = max(1, min(n, os.cpu_count() or 1))
+    # Bounded hand-off from decode to the grouping stage: decoders stall
+    # instead of piling up decoded images when inference falls behind
+    decoded: "queue.Queue[Tuple[int, Optional[_Prepared]]]" = queue.Queue(maxsize=2 * workers)
+    
+    def size_of(i: int) -> Tuple[Optional[int], Optional[int]]:
+        size = target_sizes[i] if target_sizes is not None else None
+        return size if size else (None, None)
+    
+    def prepare(i: int) -> None:
+        item = None
+        try:
+            item = _prepare(srcs[i], kind)
+        except Exception as e:
+            results[i] = _record_failure(srcs[i], e, log_jsonl)
+        finally:
+            decoded.put((i, item))
+    
+    def finish(i: int, item: _Prepared, sf: Optional[int] = None) -> None:
+        try:
+            results[i] = _finish(
+                item, dsts[i], target, *size_of(i), log_jsonl,
+                sf=sf, compress_level=compress_level
+            )
+        except Exception as e:
+            results[i] = _record_failure(srcs[i], e, log_jsonl)
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as decode_pool, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode") as encode_pool:
         
-    except Exception as e:
-        error_msg = f"{src}: {e}"
-        error_meta = {
-            "src": str(src),
-            "error": str(e),
-            "ok": False
-        }
+        def flush_sr(mode: str, group: List[Tuple[int, _Prepared]]) -> None:
+            # Same (mode, size) illustrations stacked into one NCHW batch
+            try:
+                if not sr_available():
+                    raise RuntimeError("realesrgan-ncnn-vulkan not found and auto-download failed")
+                outs = run_realesrgan_batch(
+                    [item[0].arr for _, item in group],
+                    scale=SR_SCALE,
+                    model=SR_MODEL
+                )
+            except Exception as e:
+                for i, _ in group:
+                    results[i] = _record_failure(srcs[i], e, log_jsonl)
+                return
+            for (i, (_, icc, k, meta)), out in zip(group, outs):
+                encode_pool.submit(finish, i, (ImageBuf(out, mode), icc, k, meta))
         
-        # Log error if requested
-        if log_jsonl:
+        def flush_pixel(group: List[Tuple[int, _Prepared]]) -> None:
+            # Integer scales for the whole group in one vectorized call
             try:
-                log_jsonl.parent.mkdir(parents=True, exist_ok=True)
-                with open(log_jsonl, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(error_meta, ensure_ascii=False) + "\n")
-            except Exception:
-                pass
+                basis = [_pixel_scale_basis(item[0], target, *size_of(i)) for i, item in group]
+                sfs = choose_integer_scale_many(
+                    np.array([wh for wh, _ in basis]),
+                    np.array([t for _, t in basis])
+                )
+            except Exception as e:
+                for i, _ in group:
+                    results[i] = _record_failure(srcs[i], e, log_jsonl)
+                return
+            for (i, item), sf in zip(group, sfs.tolist()):
+                encode_pool.submit(finish, i, item, sf)
         
-        # Re-raise with context
-        raise RuntimeError(error_msg) from e
+        for i in range(n):
+            decode_pool.submit(prepare, i)
+        
+        buckets: Dict[Tuple[str, Tuple[int, int]], List[Tuple[int, _Prepared]]] = {}
+        pixel: List[Tuple[int, _Prepared]] = []
+        for _ in range(n):
+            i, item = decoded.get()
+            if item is None:
+                continue
+            buf, _, k, meta = item
+            if k == Kind.pixel_art:
+                pixel.append((i, item))
+                if len(pixel) >= SR_MAX_BATCH:
+                    flush_pixel(pixel)
+                    pixel = []
+            elif use_sr and _needs_superres(buf.size, target, *size_of(i)):
+                key = (buf.mode, buf.size)
+                group = buckets.setdefault(key, [])
+                group.append((i, item))
+                if len(group) >= SR_MAX_BATCH:
+                    flush_sr(buf.mode, buckets.pop(key))
+            else:
+                if use_sr:
+                    meta["superres_skipped"] = True
+                encode_pool.submit(finish, i, item)
+        
+        # Partial groups left once every item has been decoded
+        for (mode, _), group in buckets.items():
+            flush_sr(mode, group)
+        if pixel:
+            flush_pixel(pixel)
+    
+    return results
@@ -9,26 +9,55 @@ Chosen robust approach:
 
 This avoids the common Windows pitfall:
 moving only the .exe breaks models/dll resolution -> runtime failure -> 500 in FastAPI.
+
+In-process path:
+- If onnxruntime is installed and an exported ONNX model is present in the cache
+  (<cache>/onnx/<model>.onnx), run_realesrgan_array runs it in-process on arrays,
+  keeping the session (and weights) loaded between calls.
+- Otherwise it falls back to the ncnn-vulkan binary through temporary PNG files.
 """
 
 from __future__ import annotations
 
+import http.client
 import os
 import platform
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import urllib.error
 import urllib.request
 import zipfile
 
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image
+
 
 # Fixed, known-good release and asset names for portable ncnn-vulkan builds.
 REALESRGAN_VERSION = "v0.2.5.0"
 REALESRGAN_RELEASES = "https://github.com/xinntao/Real-ESRGAN/releases"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 3
+
+# Binaries whose bundle passed _validate_bundle; cleared on re-extraction
+_VALIDATED: Set[Path] = set()
 
+# Last check_realesrgan_available result as (time.monotonic(), available),
+# reused for AVAILABILITY_TTL seconds
+AVAILABILITY_TTL = 300.0
+_availability: Optional[Tuple[float, bool]] = None
 
+
+@lru_cache(maxsize=1)
 def _asset_name_for_current_os() -> Optional[str]:
     """Return the exact asset ZIP name for the current OS (v0.2.5.0)."""
     system = platform.system().lower()
@@ -85,7 +114,11 @@ def _validate_bundle(binary_path: Path) -> None:
     At minimum we expect:
     - binary exists
     - models/ directory exists somewhere near the binary (usually sibling)
+
+    A bundle that passed once is not stat-ed again (see _VALIDATED).
     """
+    if binary_path in _VALIDATED:
+        return
     if not binary_path.exists():
         raise RuntimeError(f"Real-ESRGAN binary not found: {binary_path}")
 
@@ -97,6 +130,61 @@ def _validate_bundle(binary_path: Path) -> None:
             "Real-ESRGAN bundle seems incomplete: 'models' directory not found next to the binary. "
             "Do not move only the exe; keep the entire extracted folder."
         )
+    _VALIDATED.add(binary_path)
+
+
+def _zip_is_intact(zip_path: Path) -> bool:
+    """True if zip_path exists and every member passes its CRC check."""
+    if not zip_path.exists():
+        return False
+    try:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            return z.testzip() is None
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+def _download_with_resume(url: str, dest: Path) -> None:
+    """
+    Download url to dest in 1 MB chunks, resuming a partial download.
+
+    Data goes to dest + ".part" first. A retry (or a later call after a
+    dropped connection) continues from the bytes already on disk via a
+    Range request; servers that ignore Range restart from zero.
+
+    Raises:
+        RuntimeError if every attempt fails.
+    """
+    part = dest.with_name(dest.name + ".part")
+    last_error: Optional[Exception] = None
+    for _ in range(DOWNLOAD_RETRIES):
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as resp:
+                resumed = offset > 0 and resp.status == 206
+                with open(part, "ab" if resumed else "wb") as f:
+                    start = f.tell()
+                    shutil.copyfileobj(resp, f, DOWNLOAD_CHUNK_SIZE)
+                    received = f.tell() - start
+                # Chunked reads return short data instead of raising when the
+                # connection drops early; compare against the declared length
+                expected = int(resp.headers.get("Content-Length") or received)
+                if received < expected:
+                    raise http.client.IncompleteRead(b"", expected - received)
+            part.replace(dest)
+            return
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and offset > 0:
+                # Nothing left to fetch: the partial file is already complete
+                part.replace(dest)
+                return
+            last_error = e
+        except (OSError, http.client.HTTPException) as e:
+            # URLError, timeouts, dropped connections and bodies cut short
+            # (IncompleteRead); keep the partial file
+            last_error = e
+    raise RuntimeError(f"Download failed after {DOWNLOAD_RETRIES} attempts: {last_error}")
 
 
 def download_realesrgan() -> Optional[Path]:
@@ -134,21 +222,29 @@ def download_realesrgan() -> Optional[Path]:
                 # Extraction may be corrupted; re-extract below.
                 shutil.rmtree(extract_dir, ignore_errors=True)
 
-    # Download ZIP into cache root.
+    # Download ZIP into cache root (reusing an intact one from an earlier attempt).
     download_url = f"{REALESRGAN_RELEASES}/download/{REALESRGAN_VERSION}/{asset}"
     zip_path = cache_dir / asset
 
     try:
-        print(f"Downloading realesrgan-ncnn-vulkan from {download_url}...")
-        urllib.request.urlretrieve(download_url, zip_path)
+        if not _zip_is_intact(zip_path):
+            zip_path.unlink(missing_ok=True)
+            print(f"Downloading realesrgan-ncnn-vulkan from {download_url}...")
+            _download_with_resume(download_url, zip_path)
+            if not _zip_is_intact(zip_path):
+                zip_path.unlink(missing_ok=True)
+                raise RuntimeError(f"Downloaded archive is corrupt: {zip_path}")
 
         # Fresh extract
+        _VALIDATED.clear()
         if extract_dir.exists():
             shutil.rmtree(extract_dir, ignore_errors=True)
         extract_dir.mkdir(parents=True, exist_ok=True)
 
+        # Member by member, so each file is streamed from the archive to disk
         with zipfile.ZipFile(zip_path, "r") as z:
-            z.extractall(extract_dir)
+            for info in z.infolist():
+                z.extract(info, extract_dir)
 
         # Locate binary (zip may contain nested folder)
         found = None
@@ -165,6 +261,7 @@ def download_realesrgan() -> Optional[Path]:
 
         # Validate required resources
         _validate_bundle(found)
+        _find_installed_realesrgan.cache_clear()
 
         # Optionally remove ZIP to save space
         try:
@@ -180,14 +277,13 @@ def download_realesrgan() -> Optional[Path]:
         return None
 
 
-def get_realesrgan_path() -> Optional[Path]:
+@lru_cache(maxsize=1)
+def _find_installed_realesrgan() -> Optional[Path]:
     """
-    Get a working realesrgan-ncnn-vulkan binary.
+    Locate an already installed binary (PATH, then the cached bundle).
 
-    Priority:
-    1) PATH install
-    2) cached extracted portable bundle
-    3) download + extract portable bundle
+    Memoized so repeated SR calls don't re-walk the bundle directory;
+    download_realesrgan clears it after extracting a new bundle.
     """
     path_binary = find_realesrgan_in_path()
     if path_binary:
@@ -204,8 +300,21 @@ def get_realesrgan_path() -> Optional[Path]:
                 return p
             except Exception:
                 break
+    return None
+
+
+def get_realesrgan_path() -> Optional[Path]:
+    """
+    Get a working realesrgan-ncnn-vulkan binary.
+
+    Priority:
+    1) PATH install
+    2) cached extracted portable bundle
+    3) download + extract portable bundle
 
-    return download_realesrgan()
+    The lookup of 1) and 2) is cached for the life of the process.
+    """
+    return _find_installed_realesrgan() or download_realesrgan()
 
 
 def check_realesrgan_available() -> bool:
@@ -214,7 +323,19 @@ def check_realesrgan_available() -> bool:
     
     This will attempt to download if not found, but may return False
     if the binary exists but cannot be executed (e.g., missing dependencies).
+    The result is reused for AVAILABILITY_TTL seconds.
     """
+    global _availability
+    now = time.monotonic()
+    if _availability is not None and now - _availability[0] < AVAILABILITY_TTL:
+        return _availability[1]
+    available = _probe_realesrgan()
+    _availability = (now, available)
+    return available
+
+
+def _probe_realesrgan() -> bool:
+    """Locate (or download) the binary and run it once with -h."""
     binary_path = get_realesrgan_path()
     if not binary_path:
         return False
@@ -324,3 +445,363 @@ def run_realesrgan(
 
     except subprocess.TimeoutExpired:
         raise RuntimeError("realesrgan-ncnn-vulkan timed out")
+
+
+# ---------------------------------------------------------------------------
+# In-process inference (ONNX Runtime)
+# ---------------------------------------------------------------------------
+
+# Loaded sessions keyed by (model path, providers); weights stay resident
+_session_cache: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+
+# Inputs larger than one tile (plus overlap) are run tile by tile, so model
+# activations stay O(tile^2) instead of O(H * W); the host only holds the
+# uint8 result besides. One window per model call by default, as the 4x
+# activations of a 544 px window alone take GBs; ASSET_COMPANION_SR_TILE_BATCH
+# raises it on devices with room to spare
+TILE_SIZE = 512
+TILE_PAD = 16
+
+
+def _tile_batch_from_env() -> int:
+    """Tiles per model call from ASSET_COMPANION_SR_TILE_BATCH (default 1)."""
+    value = os.environ.get("ASSET_COMPANION_SR_TILE_BATCH") or "1"
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"Ignoring invalid ASSET_COMPANION_SR_TILE_BATCH={value!r}; using 1")
+        return 1
+
+
+TILE_BATCH = _tile_batch_from_env()
+
+# Temp files for the binary go to tmpfs where there is one (Linux)
+_SR_TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+# Scratch input tensors reused across calls, per thread, keyed by shape/dtype
+WORK_BUFFER_SLOTS = 4
+_work_buffers = threading.local()
+
+
+def get_onnx_model_path(model: str = "realesrgan-x4plus", fp16: bool = False) -> Path:
+    """Location of the exported ONNX model: <cache>/onnx/<model>[_fp16].onnx."""
+    suffix = "_fp16" if fp16 else ""
+    return get_realesrgan_cache_dir() / "onnx" / f"{model}{suffix}.onnx"
+
+
+def _onnx_providers(ort: Any) -> List[Any]:
+    """CUDA first when onnxruntime-gpu provides it, CPU otherwise."""
+    if "CUDAExecutionProvider" in ort.get_available_providers():
+        return [
+            ("CUDAExecutionProvider", {"cudnn_conv_algo_search": "HEURISTIC"}),
+            "CPUExecutionProvider",
+        ]
+    return ["CPUExecutionProvider"]
+
+
+def get_onnx_session(model: str = "realesrgan-x4plus") -> Optional[Any]:
+    """
+    Get a cached ONNX Runtime session for the model.
+
+    On CUDA an FP16 export (<model>_fp16.onnx) is preferred when present;
+    the CPU provider always uses the FP32 export, as it has no fast
+    half-precision convolutions.
+
+    Returns:
+        InferenceSession, or None if onnxruntime or the model file is missing.
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        return None
+
+    providers = _onnx_providers(ort)
+    names = tuple(p if isinstance(p, str) else p[0] for p in providers)
+    candidates = [get_onnx_model_path(model)]
+    if "CUDAExecutionProvider" in names:
+        candidates.insert(0, get_onnx_model_path(model, fp16=True))
+    model_path = next((p for p in candidates if p.exists()), None)
+    if model_path is None:
+        return None
+
+    key = (str(model_path), names)
+    session = _session_cache.get(key)
+    if session is None:
+        session = ort.InferenceSession(str(model_path), providers=providers)
+        _session_cache[key] = session
+    return session
+
+
+def _work_buffer(shape: Tuple[int, ...], dtype: Any) -> np.ndarray:
+    """
+    Scratch array for (shape, dtype), reused across calls on the same thread.
+
+    The last WORK_BUFFER_SLOTS shapes are kept (LRU), so repeated batches,
+    buckets and tiles of one size stop allocating their input tensor.
+    Contents are undefined; callers overwrite the whole array.
+    """
+    pool = getattr(_work_buffers, "pool", None)
+    if pool is None:
+        pool = _work_buffers.pool = OrderedDict()
+    key = (tuple(shape), np.dtype(dtype).str)
+    buf = pool.get(key)
+    if buf is None:
+        buf = np.empty(shape, dtype)
+        pool[key] = buf
+        while len(pool) > WORK_BUFFER_SLOTS:
+            pool.popitem(last=False)
+    else:
+        pool.move_to_end(key)
+    return buf
+
+
+def _run_session(session: Any, images: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Run same-shape (H, W, 3+) uint8 images through the session.
+
+    Returns:
+        (N, H', W', 3) uint8 array
+    """
+    inp = session.get_inputs()[0]
+    out = session.get_outputs()[0].name
+    # Feed the precision the model was exported with (FP16 halves the bytes moved)
+    dtype = np.float16 if inp.type == "tensor(float16)" else np.float32
+    h, w = images[0].shape[:2]
+    # Normalize straight from HWC uint8 into a reused NCHW tensor (no stack,
+    # transpose copy or temporary float array)
+    x = _work_buffer((len(images), 3, h, w), dtype)
+    for j, img in enumerate(images):
+        np.multiply(img[..., :3].transpose(2, 0, 1), dtype(1.0 / 255.0), out=x[j], casting="unsafe")
+    # Exported models may fix the batch dimension (usually to 1)
+    step = inp.shape[0] if isinstance(inp.shape[0], int) else len(x)
+    y = np.concatenate([
+        session.run([out], {inp.name: x[i:i + step]})[0]
+        for i in range(0, len(x), step)
+    ]) if step < len(x) else session.run([out], {inp.name: x})[0]
+    # Scale to [0, 255] in place on the session's output, then one rounding cast
+    np.clip(y, 0.0, 1.0, out=y)
+    y *= 255.0
+    y += 0.5
+    result = np.empty((y.shape[0], y.shape[2], y.shape[3], 3), np.uint8)
+    np.copyto(result, y.transpose(0, 2, 3, 1), casting="unsafe")
+    return result
+
+
+def warmup(
+    shapes: Sequence[Tuple[int, int, int]] = ((1, 256, 256), (1, TILE_SIZE + 2 * TILE_PAD, TILE_SIZE + 2 * TILE_PAD)),
+    model: str = "realesrgan-x4plus",
+) -> bool:
+    """
+    Load the in-process SR model ahead of the first request.
+
+    Creates (and caches) the ONNX session. On CUDA it also runs one dummy
+    batch per (batch, height, width) shape, so cuDNN algorithm selection
+    and kernel setup for those shapes happen here rather than on the first
+    real image. On CPU only the session is created, as a dummy forward of
+    the full model would cost as much as a real one. Never downloads the
+    binary and never raises.
+
+    Returns:
+        True if an ONNX session is ready.
+    """
+    try:
+        session = get_onnx_session(model)
+        if session is None:
+            return False
+        if "CUDAExecutionProvider" in session.get_providers():
+            for b, h, w in shapes:
+                _run_session(session, [np.zeros((h, w, 3), np.uint8)] * b)
+        return True
+    except Exception as e:
+        print(f"Real-ESRGAN warmup failed: {e}")
+        return False
+
+
+def _run_realesrgan_via_files(arr: np.ndarray, scale: int, model: str) -> np.ndarray:
+    """
+    Fallback: round-trip the array through the ncnn-vulkan binary.
+
+    The binary only reads and writes files (no stdin/stdout piping), so
+    the hand-off stays on disk, but in RAM-backed /dev/shm when available
+    and with the fastest PNG compression for the throwaway input.
+    """
+    mode = "RGBA" if arr.shape[2] == 4 else "RGB"
+    with tempfile.TemporaryDirectory(prefix="asset-companion-sr-", dir=_SR_TEMP_DIR) as tmp:
+        tmp_in = Path(tmp) / "in.png"
+        tmp_out = Path(tmp) / "out.png"
+        Image.fromarray(arr, mode=mode).save(tmp_in, compress_level=1)
+        run_realesrgan(tmp_in, tmp_out, scale=scale, model=model)
+        with Image.open(tmp_out) as img:
+            return np.asarray(img.convert(mode))
+
+
+def _finalize_sr(src: np.ndarray, rgb: np.ndarray, scale: int) -> np.ndarray:
+    """Bring model RGB output to the requested scale and attach upscaled alpha."""
+    h, w = src.shape[:2]
+    out_size = (w * scale, h * scale)
+    if rgb.shape[1::-1] != out_size:
+        # Model's native scale differs from the requested one
+        rgb = cv2.resize(rgb, out_size, interpolation=cv2.INTER_LANCZOS4)
+    if src.shape[2] == 4:
+        alpha = cv2.resize(src[..., 3], out_size, interpolation=cv2.INTER_LINEAR)
+        rgb = np.dstack((rgb, alpha))
+    return rgb
+
+
+def _tile_starts(length: int, window: int, step: int) -> List[int]:
+    """Window origins covering [0, length); the last window is flush with the end."""
+    starts = list(range(0, length - window + 1, step))
+    if starts[-1] != length - window:
+        starts.append(length - window)
+    return starts
+
+
+def _tile_cuts(starts: List[int], window: int, length: int) -> List[Tuple[int, int]]:
+    """
+    Span of [0, length) kept from each window: neighbours split their overlap
+    at its midpoint, so every kept pixel had context on both sides.
+    """
+    cuts = []
+    for k, start in enumerate(starts):
+        lo = 0 if k == 0 else (starts[k - 1] + window + start) // 2
+        hi = length if k == len(starts) - 1 else (start + window + starts[k + 1]) // 2
+        cuts.append((lo, hi))
+    return cuts
+
+
+def run_realesrgan_tiled(
+    arr: np.ndarray,
+    tile: int = TILE_SIZE,
+    pad: int = TILE_PAD,
+    scale: int = 4,
+    model: str = "realesrgan-x4plus",
+    batch: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Super-resolve a large (H, W, 3|4) uint8 RGB(A) array tile by tile.
+
+    The image is split into (tile + 2 * pad) windows overlapping by at least
+    2 * pad px and run `batch` at a time through the in-process model. Each
+    window's output is cropped to the middle of its overlaps and pasted
+    straight into the uint8 result, so besides the result itself only one
+    batch of tiles is held in memory. Without ONNX Runtime this falls back
+    to the binary, which tiles itself.
+
+    Args:
+        arr: input array, RGB or RGBA, uint8
+        tile: tile size in input pixels
+        pad: overlap (context) in input pixels on each side of a tile
+        scale: upscale factor (2 or 4 typically)
+        model: model name (e.g. realesrgan-x4plus)
+        batch: windows per model call (default TILE_BATCH)
+
+    Returns:
+        (H * scale, W * scale, C) uint8 array
+
+    Raises:
+        RuntimeError if no backend is available or inference fails.
+    """
+    session = get_onnx_session(model)
+    if session is None:
+        return _run_realesrgan_via_files(arr, scale, model)
+    batch = max(1, batch if batch is not None else TILE_BATCH)
+
+    h, w = arr.shape[:2]
+    th, tw = min(tile + 2 * pad, h), min(tile + 2 * pad, w)
+    # (H - th + 1, W - tw + 1, 3, th, tw) view; tiles are only copied into the input tensor
+    windows = sliding_window_view(arr[..., :3], (th, tw), axis=(0, 1))
+    ys, xs = _tile_starts(h, th, tile), _tile_starts(w, tw, tile)
+    y_cuts, x_cuts = _tile_cuts(ys, th, h), _tile_cuts(xs, tw, w)
+    origins = [(iy, ix) for iy in range(len(ys)) for ix in range(len(xs))]
+
+    out = None
+    n = scale
+    for i in range(0, len(origins), batch):
+        chunk = origins[i:i + batch]
+        outs = _run_session(session, [windows[ys[iy], xs[ix]].transpose(1, 2, 0) for iy, ix in chunk])
+        if out is None:
+            n = outs.shape[1] // th
+            # At the requested scale alpha goes straight into the result;
+            # otherwise _finalize_sr resizes the RGB and attaches it
+            channels = arr.shape[2] if n == scale else 3
+            out = np.empty((h * n, w * n, channels), np.uint8)
+        for (iy, ix), tile_out in zip(chunk, outs):
+            (y0, y1), (x0, x1) = y_cuts[iy], x_cuts[ix]
+            y, x = ys[iy], xs[ix]
+            out[y0 * n:y1 * n, x0 * n:x1 * n, :3] = tile_out[
+                (y0 - y) * n:(y1 - y) * n, (x0 - x) * n:(x1 - x) * n
+            ]
+        del outs
+
+    if out.shape[2] == 4:
+        out[..., 3] = cv2.resize(arr[..., 3], (w * n, h * n), interpolation=cv2.INTER_LINEAR)
+        return out
+    return _finalize_sr(arr, out, scale)
+
+
+def run_realesrgan_batch(
+    arrs: Sequence[np.ndarray],
+    scale: int = 4,
+    model: str = "realesrgan-x4plus",
+) -> List[np.ndarray]:
+    """
+    Super-resolve several same-shape (H, W, 3|4) uint8 RGB(A) arrays.
+
+    With ONNX Runtime the RGB planes are stacked into one NCHW batch and
+    run in a single session call; alpha is upscaled separately with
+    bilinear interpolation. Arrays larger than one tile go through
+    run_realesrgan_tiled instead. Falls back to one realesrgan-ncnn-vulkan
+    run per array otherwise.
+
+    Args:
+        arrs: input arrays, all with the same shape, uint8
+        scale: upscale factor (2 or 4 typically)
+        model: model name (e.g. realesrgan-x4plus)
+
+    Returns:
+        List of (H * scale, W * scale, C) uint8 arrays, in input order
+
+    Raises:
+        ValueError if the arrays differ in shape.
+        RuntimeError if no backend is available or inference fails.
+    """
+    if not arrs:
+        return []
+    shape = arrs[0].shape
+    if any(a.shape != shape for a in arrs):
+        raise ValueError("run_realesrgan_batch needs arrays of the same shape")
+
+    session = get_onnx_session(model)
+    if session is None:
+        return [_run_realesrgan_via_files(a, scale, model) for a in arrs]
+
+    if max(shape[:2]) > TILE_SIZE + 2 * TILE_PAD:
+        return [run_realesrgan_tiled(a, scale=scale, model=model) for a in arrs]
+
+    rgb = _run_session(session, arrs)
+    return [_finalize_sr(a, r, scale) for a, r in zip(arrs, rgb)]
+
+
+def run_realesrgan_array(
+    arr: np.ndarray,
+    scale: int = 4,
+    model: str = "realesrgan-x4plus",
+) -> np.ndarray:
+    """
+    Super-resolve an (H, W, 3|4) uint8 RGB(A) array.
+
+    Runs in-process through ONNX Runtime when available, otherwise through
+    the realesrgan-ncnn-vulkan binary (see run_realesrgan_batch).
+
+    Args:
+        arr: input array, RGB or RGBA, uint8
+        scale: upscale factor (2 or 4 typically)
+        model: model name (e.g. realesrgan-x4plus)
+
+    Returns:
+        (H * scale, W * scale, C) uint8 array
+
+    Raises:
+        RuntimeError if no backend is available or inference fails.
+    """
+    return run_realesrgan_batch([arr], scale, model)[0]
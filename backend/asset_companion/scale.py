@@ -1,12 +1,31 @@
 """Image scaling operations."""
-from typing import Tuple
+import os
+from typing import Optional, Tuple, Union
+import numpy as np
+from numba import njit
+import PIL
 from PIL import Image
 from PIL.Image import Resampling
 
+# libvips is optional; OSError covers pyvips installed without the library
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
 # Resampling constants
 LANCZOS = Resampling.LANCZOS
 NEAREST = Resampling.NEAREST
 
+# Lanczos backend, chosen once at import. Pillow by default (Pillow-SIMD,
+# versions "x.y.z.postN", vectorizes the same filter). libvips is opt-in with
+# ASSET_COMPANION_RESIZE_BACKEND=vips, since its Lanczos3 differs from
+# Pillow's by a few levels (more on faint alpha), which changes outputs.
+PILLOW_SIMD = ".post" in PIL.__version__
+RESIZE_BACKEND = "pillow"
+if os.environ.get("ASSET_COMPANION_RESIZE_BACKEND") == "vips" and pyvips is not None:
+    RESIZE_BACKEND = "vips"
+
 
 def choose_integer_scale(src_wh: Tuple[int, int], target: int) -> int:
     """
@@ -20,8 +39,25 @@ def choose_integer_scale(src_wh: Tuple[int, int], target: int) -> int:
         Integer scale factor
     """
     w, h = src_wh
-    sf = max(1, min(target // max(1, w), target // max(1, h)))
-    return max(sf, 1)
+    return max(1, target // max(1, w, h))
+
+
+def choose_integer_scale_many(
+    wh: np.ndarray, 
+    target: Union[int, np.ndarray]
+) -> np.ndarray:
+    """
+    Vectorized choose_integer_scale for many sizes at once.
+    
+    Args:
+        wh: (N, 2) integer array of source (width, height)
+        target: Target size, shared or one per row
+        
+    Returns:
+        (N,) integer array of scale factors
+    """
+    wh = np.asarray(wh, dtype=np.int64)
+    return np.maximum(1, np.asarray(target) // np.maximum(1, wh.max(axis=1)))
 
 
 def resize_nearest(pil_img: Image.Image, scale: int) -> Image.Image:
@@ -41,6 +77,100 @@ def resize_nearest(pil_img: Image.Image, scale: int) -> Image.Image:
     )
 
 
+def _resize_lanczos_vips(pil_img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Lanczos3 resize through libvips, premultiplying alpha like Pillow does."""
+    arr = np.asarray(pil_img)
+    img = pyvips.Image.new_from_array(arr)
+    if pil_img.mode == "RGBA":
+        img = img.premultiply()
+    img = img.resize(size[0] / pil_img.width, vscale=size[1] / pil_img.height, kernel="lanczos3")
+    if pil_img.mode == "RGBA":
+        # Float result; round like Pillow rather than truncate in the cast
+        img = img.unpremultiply().rint()
+    # Rounding in libvips can leave the result a pixel off; pin the exact size
+    img = img.gravity("north-west", size[0], size[1], extend="copy").cast("uchar")
+    out = np.ndarray(
+        buffer=img.write_to_memory(),
+        dtype=np.uint8,
+        shape=(img.height, img.width, img.bands)
+    )
+    return Image.fromarray(out, mode=pil_img.mode)
+
+
+def _resize_lanczos(pil_img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Lanczos resize with the backend selected at import time."""
+    if RESIZE_BACKEND == "vips" and pil_img.mode in ("RGB", "RGBA"):
+        return _resize_lanczos_vips(pil_img, size)
+    return pil_img.resize(size, resample=LANCZOS)
+
+
+@njit(cache=True, nogil=True)
+def _nearest_rgba(src: np.ndarray, scale: int, dst: np.ndarray) -> None:
+    """Integer nearest upscale of (H, W) packed RGBA (uint32) into dst (H*s, W*s)."""
+    h, w = src.shape
+    for y in range(h):
+        y0 = y * scale
+        row = dst[y0]
+        for x in range(w):
+            v = src[y, x]
+            x0 = x * scale
+            for dx in range(scale):
+                row[x0 + dx] = v
+        # Remaining output rows of this block are copies of the first
+        for dy in range(1, scale):
+            dst[y0 + dy] = row
+
+
+@njit(cache=True, nogil=True)
+def _nearest_any(src: np.ndarray, scale: int, dst: np.ndarray) -> None:
+    """Integer nearest upscale of (H, W, C) uint8 into dst (H*s, W*s, C)."""
+    h, w, c = src.shape
+    for y in range(h):
+        y0 = y * scale
+        row = dst[y0]
+        for x in range(w):
+            x0 = x * scale
+            for dx in range(scale):
+                for ch in range(c):
+                    row[x0 + dx, ch] = src[y, x, ch]
+        for dy in range(1, scale):
+            dst[y0 + dy] = row
+
+
+def resize_nearest_np(
+    arr: np.ndarray, 
+    scale: int, 
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Resize an (H, W, C) uint8 array by an integer factor (for pixel art).
+    
+    Same result as resize_nearest, without the PIL round-trip. RGBA pixels
+    are copied as single 32-bit words.
+    
+    Args:
+        arr: Input array
+        scale: Integer scale factor
+        out: Optional preallocated (H * scale, W * scale, C) uint8 array
+        
+    Returns:
+        Scaled array (out, if given)
+    """
+    if arr.ndim == 2:
+        arr = arr[..., None]
+    h, w, c = arr.shape
+    if out is None:
+        out = np.empty((h * scale, w * scale, c), np.uint8)
+    elif out.shape != (h * scale, w * scale, c) or out.dtype != np.uint8:
+        raise ValueError("out has the wrong shape or dtype")
+    arr = np.ascontiguousarray(arr)
+    if c == 4 and out.flags.c_contiguous:
+        _nearest_rgba(arr.view(np.uint32)[..., 0], scale, out.view(np.uint32)[..., 0])
+    else:
+        _nearest_any(arr, scale, out)
+    return out
+
+
 def resize_lanczos_to_box(
     pil_img: Image.Image, 
     target_wh: Tuple[int, int]
@@ -55,7 +185,7 @@ def resize_lanczos_to_box(
     Returns:
         Resized image
     """
-    return pil_img.resize(target_wh, resample=LANCZOS)
+    return _resize_lanczos(pil_img, target_wh)
 
 
 def resize_lanczos_fit_long(
@@ -87,4 +217,4 @@ def resize_lanczos_fit_long(
     else:
         new_h = target_long
         new_w = max(1, int(w * (target_long / h)))
-    return pil_img.resize((new_w, new_h), resample=LANCZOS)
+    return _resize_lanczos(pil_img, (new_w, new_h))
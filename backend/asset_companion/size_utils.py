@@ -1,5 +1,5 @@
 """Size calculation utilities for asset dimensions."""
-from typing import Tuple, Optional
+from typing import Callable, Dict, Tuple, Optional
 
 
 def round_to_power_of_two(value: int) -> int:
@@ -14,15 +14,11 @@ def round_to_power_of_two(value: int) -> int:
     """
     if value <= 0:
         return 1
-    # Find nearest power of 2
-    power = 1
-    while power < value:
-        power <<= 1
-    # Choose closer: power or power // 2
-    if power - value < value - (power // 2):
-        return power
-    else:
-        return power // 2 if power // 2 > 0 else 1
+    # Powers of 2 bracketing value (hi is exact if value already is one)
+    hi = 1 << (value - 1).bit_length()
+    lo = hi >> 1
+    # Choose closer: hi or lo (ties go to lo)
+    return hi if (hi - value) < (value - lo) else max(lo, 1)
 
 
 def round_to_multiple(value: int, multiple: int) -> int:
@@ -89,6 +85,85 @@ def auto_suggest_size(
     return (suggested_w, suggested_h)
 
 
+def _custom(
+    width: int,
+    height: int,
+    custom_width: Optional[int],
+    custom_height: Optional[int],
+    multiple: int
+) -> Tuple[int, int]:
+    """"custom" mode: the explicit custom size."""
+    if custom_width is None or custom_height is None:
+        raise ValueError("custom_width and custom_height required for custom mode")
+    return (custom_width, custom_height)
+
+
+def _pow2(
+    width: int,
+    height: int,
+    custom_width: Optional[int],
+    custom_height: Optional[int],
+    multiple: int
+) -> Tuple[int, int]:
+    """"power_of_two" mode: both sides rounded to powers of 2."""
+    aspect = width / height if height > 0 else 1.0
+    long_side = max(width, height)
+    suggested_long = round_to_power_of_two(long_side)
+    
+    if width >= height:
+        target_w = suggested_long
+        target_h = max(8, round_to_power_of_two(round(target_w / aspect)))
+    else:
+        target_h = suggested_long
+        target_w = max(8, round_to_power_of_two(round(target_h * aspect)))
+    
+    return (target_w, target_h)
+
+
+def _multiple(
+    width: int,
+    height: int,
+    custom_width: Optional[int],
+    custom_height: Optional[int],
+    multiple: int
+) -> Tuple[int, int]:
+    """"multiple" mode: both sides rounded to a multiple."""
+    aspect = width / height if height > 0 else 1.0
+    long_side = max(width, height)
+    suggested_long = round_to_multiple(long_side, multiple)
+    
+    if width >= height:
+        target_w = suggested_long
+        target_h = max(multiple, round_to_multiple(round(target_w / aspect), multiple))
+    else:
+        target_h = suggested_long
+        target_w = max(multiple, round_to_multiple(round(target_h * aspect), multiple))
+    
+    return (target_w, target_h)
+
+
+def _auto(
+    width: int,
+    height: int,
+    custom_width: Optional[int],
+    custom_height: Optional[int],
+    multiple: int
+) -> Tuple[int, int]:
+    """"auto" mode: auto_suggest_size, preferring powers of 2."""
+    return auto_suggest_size(width, height, prefer_power_of_two=True)
+
+
+# Size mode -> implementation, resolved once per call instead of a chain of
+# string comparisons; unknown modes fall back to auto
+_SizeFn = Callable[[int, int, Optional[int], Optional[int], int], Tuple[int, int]]
+_DISPATCH: Dict[str, _SizeFn] = {
+    "auto": _auto,
+    "power_of_two": _pow2,
+    "multiple": _multiple,
+    "custom": _custom,
+}
+
+
 def calculate_target_size(
     width: int,
     height: int,
@@ -115,41 +190,5 @@ def calculate_target_size(
     Returns:
         (target_width, target_height) tuple
     """
-    if mode == "custom":
-        if custom_width is None or custom_height is None:
-            raise ValueError("custom_width and custom_height required for custom mode")
-        return (custom_width, custom_height)
-    
-    if mode == "power_of_two":
-        aspect = width / height if height > 0 else 1.0
-        long_side = max(width, height)
-        suggested_long = round_to_power_of_two(long_side)
-        
-        if width >= height:
-            target_w = suggested_long
-            target_h = max(8, round_to_power_of_two(round(target_w / aspect)))
-        else:
-            target_h = suggested_long
-            target_w = max(8, round_to_power_of_two(round(target_h * aspect)))
-        
-        return (target_w, target_h)
-    
-    if mode == "multiple":
-        aspect = width / height if height > 0 else 1.0
-        long_side = max(width, height)
-        suggested_long = round_to_multiple(long_side, multiple)
-        
-        if width >= height:
-            target_w = suggested_long
-            target_h = max(multiple, round_to_multiple(round(target_w / aspect), multiple))
-        else:
-            target_h = suggested_long
-            target_w = max(multiple, round_to_multiple(round(target_h * aspect), multiple))
-        
-        return (target_w, target_h)
-    
-    # Default: auto mode
-    return auto_suggest_size(width, height, prefer_power_of_two=True)
-
-
-
+    size_fn = _DISPATCH.get(mode, _auto)
+    return size_fn(width, height, custom_width, custom_height, multiple)